@@ -33,6 +33,17 @@ assert any(app in INSTALLED_APPS for app in ['posts.apps.PostsConfig', 'posts'])
     'Пожалуйста зарегистрируйте приложение в `settings.INSTALLED_APPS`'
 )
 
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def _isolated_cache():
+    # Кэш во временном каталоге, а не в cache.sqlite3 проекта.
+    from core.test_runner import isolated_cache
+    with isolated_cache():
+        yield
+
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
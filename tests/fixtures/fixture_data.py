@@ -9,6 +9,8 @@ from posts.models import Post, Group
 def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
         settings.MEDIA_ROOT = temp_directory
+        # миниатюры строятся сразу, а не в потоке после удаления каталога
+        settings.THUMBNAIL_WORKERS = 0
         yield temp_directory
 
 
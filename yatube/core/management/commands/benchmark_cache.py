@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.sqlite_cache import SQLiteCache
+
+
+def incr_worker(location, key, count):
+    cache = SQLiteCache(location, {})
+    for _ in range(count):
+        cache.incr(key)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLiteCache с LocMemCache и FileBasedCache '
+            'на типичных для ленты операциях и проверяет атомарность '
+            'incr из нескольких процессов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=2000,
+                            help='Операций в каждом замере.')
+        parser.add_argument('--processes', type=int, default=4,
+                            help='Процессов в проверке incr.')
+
+    def backends(self, directory):
+        params = {'OPTIONS': {'MAX_ENTRIES': 100000}}
+        return {
+            'locmem': LocMemCache('benchmark', params),
+            'filebased': FileBasedCache(
+                os.path.join(directory, 'files'), params),
+            'sqlite': SQLiteCache(
+                os.path.join(directory, 'cache.sqlite3'), params),
+        }
+
+    def measure(self, cache, ops):
+        value = b'x' * 2048
+        keys = [f'key{i}' for i in range(ops)]
+        cache.set('counter', 0, None)
+        operations = {
+            'set': lambda: [cache.set(key, value) for key in keys],
+            'get': lambda: [cache.get(key) for key in keys],
+            'get_many(10)': lambda: [
+                cache.get_many(keys[i:i + 10]) for i in range(0, ops, 10)],
+            'incr': lambda: [cache.incr('counter') for _ in keys],
+        }
+        result = {}
+        for name, operation in operations.items():
+            start = time.perf_counter()
+            operation()
+            result[name] = ops / (time.perf_counter() - start)
+        return result
+
+    def check_incr(self, directory, processes, ops):
+        location = os.path.join(directory, 'shared.sqlite3')
+        cache = SQLiteCache(location, {})
+        cache.set('shared', 0, None)
+        workers = [
+            multiprocessing.Process(
+                target=incr_worker, args=(location, 'shared', ops))
+            for _ in range(processes)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        return cache.get('shared'), processes * ops / elapsed
+
+    def handle(self, *args, **options):
+        ops = options['ops']
+        with tempfile.TemporaryDirectory() as directory:
+            self.stdout.write(f'{"":<12}' + ''.join(
+                f'{name:>14}' for name in
+                ('set', 'get', 'get_many(10)', 'incr')))
+            for name, cache in self.backends(directory).items():
+                result = self.measure(cache, ops)
+                self.stdout.write(f'{name:<12}' + ''.join(
+                    f'{rate:>10.0f} о/с' for rate in result.values()))
+            processes = options['processes']
+            total, rate = self.check_incr(directory, processes, ops)
+            expected = processes * ops
+            style = (self.style.SUCCESS if total == expected
+                     else self.style.ERROR)
+            self.stdout.write(style(
+                f'incr из {processes} процессов: {total} из {expected}, '
+                f'{rate:.0f} о/с'))
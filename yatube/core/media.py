@@ -0,0 +1,154 @@
+"""Отдача файлов из MEDIA_ROOT под контролем Django.
+
+Режим задаёт settings.MEDIA_DELIVERY:
+    'accel'    - ответ с X-Accel-Redirect на MEDIA_ACCEL_PREFIX, файл
+                 отдаёт nginx (location с internal);
+    'sendfile' - ответ с X-Sendfile, файл отдаёт Apache/lighttpd;
+    'django'   - FileResponse: целый файл уходит через wsgi.file_wrapper
+                 (sendfile в gunicorn), поддерживаются Range и условные
+                 GET по ETag и Last-Modified.
+Проверки доступа, если понадобятся, делаются здесь до выбора режима.
+Картинки с именем по содержимому кэшируются браузером навсегда.
+"""
+import mimetypes
+import os
+import re
+from http import HTTPStatus
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+from posts.storage import is_hashed
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MAX_AGE = 60 * 60
+
+
+class RangeFile:
+    """Файл, из которого читается только отрезок [start, start+length)."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) включительно по заголовку Range или None.
+
+    Несколько отрезков не поддерживаются - на них отдаём весь файл,
+    как и на неверный отрезок с концом раньше начала (RFC 7233).
+    Для отрезка, начинающегося за концом файла, возвращает (size, size).
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    start, end = match.groups()
+    if start == '':
+        length = int(end)
+        return (max(size - length, 0), size - 1) if length else (size, size)
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        return size, size
+    end = min(int(end), size - 1) if end else size - 1
+    return start, end
+
+
+def _content_type(full_path):
+    return mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+
+def _validators(path, stat):
+    if is_hashed(path):
+        return f'"{os.path.splitext(os.path.basename(path))[0]}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _range_allowed(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _file_response(request, full_path, stat, etag):
+    content_type = _content_type(full_path)
+    size = stat.st_size
+    header = request.META.get('HTTP_RANGE')
+    byte_range = None
+    if header and _range_allowed(request, etag, int(stat.st_mtime)):
+        byte_range = parse_range(header, size)
+    if byte_range is None:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type)
+    elif byte_range[0] >= size:
+        response = HttpResponse(
+            status=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            RangeFile(open(full_path, 'rb'), start, end - start + 1),
+            content_type=content_type,
+            status=HTTPStatus.PARTIAL_CONTENT,
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve(request, path):
+    """Отдаёт файл MEDIA_ROOT/path способом из settings.MEDIA_DELIVERY."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('Файл не найден')
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден')
+    etag = _validators(path, stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        delivery = settings.MEDIA_DELIVERY
+        if delivery == 'accel':
+            response = HttpResponse(content_type=_content_type(full_path))
+            # nginx раскодирует адрес сам, а не-ASCII и пробелы
+            # в заголовке Django иначе закодирует по MIME.
+            response['X-Accel-Redirect'] = (
+                settings.MEDIA_ACCEL_PREFIX + quote(path))
+        elif delivery == 'sendfile':
+            response = HttpResponse(content_type=_content_type(full_path))
+            response['X-Sendfile'] = full_path
+        else:
+            response = _file_response(request, full_path, stat, etag)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if is_hashed(path):
+        patch_cache_control(response, public=True, immutable=True,
+                            max_age=IMMUTABLE_MAX_AGE)
+    else:
+        patch_cache_control(response, public=True, max_age=MAX_AGE)
+    return response
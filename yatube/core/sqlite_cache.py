@@ -0,0 +1,281 @@
+"""Кэш в файле SQLite (WAL), общий для всех процессов на одном хосте.
+
+В отличие от LocMemCache, у всех воркеров gunicorn одна копия кэша,
+поэтому фрагменты, отрендеренные одним воркером, видят остальные,
+а сброс версий из posts/fragments.py сразу действует везде.
+
+Настройки (OPTIONS):
+    MAX_ENTRIES     - предел числа записей (как у встроенных бэкендов);
+    MAX_SIZE        - предел суммарного размера значений в байтах;
+    CULL_FREQUENCY  - при переполнении вытесняется 1/CULL_FREQUENCY записей;
+    BUSY_TIMEOUT    - сколько секунд ждать блокировку записи.
+
+Вытесняются сначала просроченные записи, затем давно не читанные (LRU).
+Время чтения обновляется не чаще раза в ACCESS_RESOLUTION секунд,
+чтобы чтения почти не превращались в записи. Число записей и их объём
+ведут триггеры, поэтому проверка пределов не делает COUNT(*).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+ACCESS_RESOLUTION = 1.0
+INT64 = range(-2 ** 63, 2 ** 63)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache_entry (
+    key TEXT PRIMARY KEY,
+    value BLOB,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_entry_accessed ON cache_entry (accessed);
+CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_entry_insert AFTER INSERT ON cache_entry
+BEGIN
+    UPDATE cache_stats SET entries = entries + 1, bytes = bytes + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_delete AFTER DELETE ON cache_entry
+BEGIN
+    UPDATE cache_stats SET entries = entries - 1, bytes = bytes - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entry_update
+AFTER UPDATE OF size ON cache_entry
+BEGIN
+    UPDATE cache_stats SET bytes = bytes - OLD.size + NEW.size;
+END;
+'''
+
+UPSERT = '''
+INSERT INTO cache_entry (key, value, expires, accessed, size)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    expires = excluded.expires,
+    accessed = excluded.accessed,
+    size = excluded.size
+'''
+
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = options.get('MAX_SIZE')
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._local = threading.local()
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            # После fork соединение родителя использовать нельзя.
+            local.connection = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            local.connection.execute('PRAGMA journal_mode=WAL')
+            local.connection.execute('PRAGMA synchronous=NORMAL')
+            local.connection.executescript(
+                f'BEGIN IMMEDIATE; {SCHEMA} COMMIT;')
+            local.pid = os.getpid()
+        return local.connection
+
+    @contextmanager
+    def _write(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _encode(self, value):
+        if type(value) is int and value in INT64:
+            # Целые храним как INTEGER, их размер условно 8 байт.
+            return value, 8
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        return pickled, len(pickled)
+
+    def _decode(self, value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _touch_accessed(self, keys, now):
+        self._connection().executemany(
+            'UPDATE cache_entry SET accessed = ? WHERE key = ?',
+            [(now, key) for key in keys],
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._connection().execute(
+            f'SELECT value, accessed FROM cache_entry '
+            f'WHERE key = ? AND {ALIVE}',
+            (key, now),
+        ).fetchone()
+        if row is None:
+            return default
+        value, accessed = row
+        if now - accessed > ACCESS_RESOLUTION:
+            self._touch_accessed([key], now)
+        return self._decode(value)
+
+    def get_many(self, keys, version=None):
+        key_map = {self._key(key, version): key for key in keys}
+        if not key_map:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(key_map))
+        rows = self._connection().execute(
+            f'SELECT key, value, accessed FROM cache_entry '
+            f'WHERE key IN ({placeholders}) AND {ALIVE}',
+            (*key_map, now),
+        ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if now - accessed > ACCESS_RESOLUTION]
+        if stale:
+            self._touch_accessed(stale, now)
+        return {key_map[key]: self._decode(value) for key, value, _ in rows}
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            f'SELECT 1 FROM cache_entry WHERE key = ? AND {ALIVE}',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), *self._pair(value, expires, now))
+            for key, value in data.items()
+        ]
+        with self._write() as connection:
+            connection.executemany(UPSERT, rows)
+            self._cull_if_needed(connection, now)
+        return []
+
+    def _pair(self, value, expires, now):
+        value, size = self._encode(value)
+        return value, expires, now, size
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        value, expires, accessed, size = self._pair(
+            value, self.get_backend_timeout(timeout), now)
+        with self._write() as connection:
+            # Перезаписываем только просроченную запись.
+            cursor = connection.execute(
+                UPSERT + ' WHERE cache_entry.expires IS NOT NULL '
+                         'AND cache_entry.expires <= ?',
+                (key, value, expires, accessed, size, now),
+            )
+            added = cursor.rowcount > 0
+            if added:
+                self._cull_if_needed(connection, now)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._connection().execute(
+            f'UPDATE cache_entry SET expires = ?, accessed = ? '
+            f'WHERE key = ? AND {ALIVE}',
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                f'SELECT value FROM cache_entry WHERE key = ? AND {ALIVE}',
+                (key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = self._decode(row[0]) + delta
+            value, size = self._encode(new_value)
+            connection.execute(
+                'UPDATE cache_entry SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?',
+                (value, size, now, key),
+            )
+        return new_value
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        cursor = self._connection().execute(
+            'DELETE FROM cache_entry WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        with self._write() as connection:
+            connection.executemany(
+                'DELETE FROM cache_entry WHERE key = ?', keys)
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache_entry')
+
+    def _over_limit(self, connection):
+        entries, size = connection.execute(
+            'SELECT entries, bytes FROM cache_stats').fetchone()
+        return entries > self._max_entries or (
+            self._max_size is not None and size > self._max_size), entries
+
+    def _cull_if_needed(self, connection, now):
+        over, entries = self._over_limit(connection)
+        if not over:
+            return
+        connection.execute(
+            'DELETE FROM cache_entry WHERE expires <= ?', (now,))
+        over, entries = self._over_limit(connection)
+        if not over:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache_entry')
+            return
+        while over and entries:
+            connection.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                'SELECT key FROM cache_entry ORDER BY accessed LIMIT ?)',
+                (max(entries // self._cull_frequency, 1),),
+            )
+            over, entries = self._over_limit(connection)
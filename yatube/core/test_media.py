@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from django.test import SimpleTestCase, override_settings
+
+HASH = 'ab' * 32
+HASHED_PATH = f'posts/ab/ab/{HASH}.gif'
+CONTENT = bytes(range(100))
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_DELIVERY='django')
+class MediaServeTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in ('posts/plain.gif', 'posts/старый файл.gif',
+                     HASHED_PATH):
+            path = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file_with_validators(self):
+        response = self.client.get('/media/posts/plain.gif')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(self.body(response), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('max-age=3600', response['Cache-Control'])
+
+    def test_not_modified(self):
+        etag = self.client.get('/media/posts/plain.gif')['ETag']
+        response = self.client.get(
+            '/media/posts/plain.gif', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_hashed_file_is_immutable(self):
+        """Имя по содержимому - ETag и вечный кэш браузера."""
+        response = self.client.get(f'/media/{HASHED_PATH}')
+        self.assertEqual(response['ETag'], f'"{HASH}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    def test_ranges(self):
+        cases = (
+            ('bytes=10-19', 'bytes 10-19/100', CONTENT[10:20]),
+            ('bytes=90-', 'bytes 90-99/100', CONTENT[90:]),
+            ('bytes=-5', 'bytes 95-99/100', CONTENT[95:]),
+            ('bytes=95-200', 'bytes 95-99/100', CONTENT[95:]),
+        )
+        for header, content_range, content in cases:
+            with self.subTest(header=header):
+                response = self.client.get(
+                    '/media/posts/plain.gif', HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(
+                    response['Content-Length'], str(len(content)))
+                self.assertEqual(self.body(response), content)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(
+            '/media/posts/plain.gif', HTTP_RANGE='bytes=100-')
+        self.assertEqual(
+            response.status_code,
+            HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_invalid_range_ignored(self):
+        response = self.client.get(
+            '/media/posts/plain.gif', HTTP_RANGE='bytes=5-3')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(self.body(response), CONTENT)
+
+    def test_stale_if_range_gets_full_file(self):
+        response = self.client.get(
+            '/media/posts/plain.gif',
+            HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(self.body(response), CONTENT)
+
+    @override_settings(MEDIA_DELIVERY='accel',
+                       MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_accel_redirect(self):
+        response = self.client.get('/media/posts/plain.gif')
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/plain.gif')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+        response = self.client.get('/media/posts/старый файл.gif')
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected-media/posts/%D1%81%D1%82%D0%B0%D1%80%D1%8B%D0%B9'
+            '%20%D1%84%D0%B0%D0%B9%D0%BB.gif')
+
+    @override_settings(MEDIA_DELIVERY='sendfile')
+    def test_sendfile(self):
+        response = self.client.get('/media/posts/plain.gif')
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(TEMP_MEDIA_ROOT, 'posts/plain.gif'))
+        self.assertEqual(response.content, b'')
+
+    def test_missing_and_outside_files(self):
+        for url in ('/media/posts/missing.gif', '/media/posts/',
+                    '/media/../settings.py', '/media/%2e%2e/db.sqlite3'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
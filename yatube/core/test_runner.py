@@ -0,0 +1,41 @@
+"""Запуск тестов с кэшем во временном файле.
+
+Кэш по умолчанию - файл cache.sqlite3 проекта, общий для всех
+воркеров. Тесты вызывают cache.clear(), поэтому на время прогона
+кэш переносится в свой временный каталог: рабочий кэш не стирается,
+а параллельные прогоны не мешают друг другу.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def isolated_cache():
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = {
+        alias: {**config,
+                'LOCATION': os.path.join(directory, f'{alias}.sqlite3')}
+        for alias, config in settings.CACHES.items()
+    }
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated_cache = isolated_cache()
+        self._isolated_cache.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated_cache.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
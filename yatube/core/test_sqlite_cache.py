@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core.sqlite_cache import SQLiteCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        super().tearDown()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_are_shared_between_instances(self):
+        """Запись одного экземпляра видна другому на том же файле."""
+        self.cache.set('key', {'text': 'пост'})
+        self.cache.set('number', 5)
+        other = self.make_cache()
+        self.assertEqual(other.get('key'), {'text': 'пост'})
+        self.assertEqual(other.incr('number', 2), 7)
+        self.assertEqual(self.cache.get('number'), 7)
+
+    def test_incr_missing_key_raises(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_add_and_expiry(self):
+        """add не перезаписывает живую запись, но занимает просроченную."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.cache.set('key', 1, 0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 2)
+
+    def test_lru_eviction_by_entries(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = self.make_cache(MAX_ENTRIES=4, CULL_FREQUENCY=2)
+        for i in range(4):
+            cache.set(f'key{i}', i)
+        cache._connection().execute(
+            "UPDATE cache_entry SET accessed = accessed + 10 "
+            "WHERE key IN (?, ?)",
+            (cache.make_key('key0'), cache.make_key('key1')))
+        cache.set('key4', 4)
+        self.assertEqual(
+            set(cache.get_many([f'key{i}' for i in range(5)])),
+            {'key0', 'key1', 'key4'})
+
+    def test_eviction_by_size(self):
+        cache = self.make_cache(MAX_SIZE=10000)
+        for i in range(10):
+            cache.set(f'key{i}', b'x' * 2000)
+        entries, size = cache._connection().execute(
+            'SELECT entries, bytes FROM cache_stats').fetchone()
+        self.assertLessEqual(size, 10000)
+        self.assertEqual(entries, len(cache.get_many(
+            [f'key{i}' for i in range(10)])))
+        self.assertIsNotNone(cache.get('key9'))
+
+
+class TestCacheLocationTest(SimpleTestCase):
+    def test_tests_do_not_use_project_cache(self):
+        """cache.clear() в тестах не стирает рабочий кэш проекта."""
+        self.assertNotEqual(
+            cache._path, os.path.join(settings.BASE_DIR, 'cache.sqlite3'))
@@ -1,9 +1,78 @@
+import datetime
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import search
+from .models import Post, PostQuerySet, Group, Comment, Follow
+
+# Дальше этого числа записи отфильтрованного списка не считаются.
+COUNT_LIMIT = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator без COUNT(*) по всей таблице.
+
+    Для полного списка число записей оценивается по наибольшему pk
+    (удалённые записи не вычитаются), для отфильтрованного - считается
+    не дальше COUNT_LIMIT.
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            return self.object_list.aggregate(last=Max('pk'))['last'] or 0
+        return self.object_list[:COUNT_LIMIT].count()
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = "-пусто-"
+
+
+def _truncate(day, kind):
+    if kind == 'year':
+        return day.replace(month=1, day=1)
+    if kind == 'month':
+        return day.replace(day=1)
+    return day
+
 
-from .models import Post, Group, Comment, Follow
+def _next_period(day, kind):
+    if kind == 'year':
+        return day.replace(year=day.year + 1)
+    if kind == 'month':
+        return day.replace(year=day.year + day.month // 12,
+                           month=day.month % 12 + 1)
+    return day + datetime.timedelta(days=1)
 
 
-class PostAdmin(admin.ModelAdmin):
+class IndexedDatesQuerySet(PostQuerySet):
+    """QuerySet для date_hierarchy, которому хватает индекса по дате.
+
+    Вместо SELECT DISTINCT по всем записям каждый год, месяц или день
+    находится одним поиском первой записи не раньше начала периода.
+    """
+
+    def dates(self, field_name, kind, order='ASC'):
+        ordered = self.order_by(field_name).values_list(
+            field_name, flat=True)
+        found = []
+        value = ordered.first()
+        while value is not None:
+            day = _truncate(timezone.localtime(value).date(), kind)
+            found.append(day)
+            start = timezone.make_aware(datetime.datetime.combine(
+                _next_period(day, kind), datetime.time.min))
+            value = ordered.filter(**{f'{field_name}__gte': start}).first()
+        return found if order == 'ASC' else found[::-1]
+
+
+class PostAdmin(ScalableAdmin):
     list_display = (
         "pk",
         "text",
@@ -12,9 +81,36 @@ class PostAdmin(admin.ModelAdmin):
         "group",
     )
     list_editable = ("group",)
+    list_select_related = ("author", "group")
     search_fields = ("text",)
     list_filter = ("pub_date",)
-    empty_value_display = "-пусто-"
+    autocomplete_fields = ("author",)
+    date_hierarchy = "pub_date"
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDatesQuerySet(
+            self.model, query=queryset.query, using=queryset.db)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск идёт по индексу FTS5, а не LIKE '%...%' по всей таблице.
+        if not search.match_expression(search_term):
+            return queryset, False
+        return search.matching(queryset, search_term), False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs)
+        if db_field.name == 'group' and request is not None:
+            # Список групп читается один раз на запрос, а не для
+            # каждой строки list_editable; iter() - чтобы list() не
+            # спрашивал у ModelChoiceIterator длину через COUNT(*).
+            choices = getattr(request, '_group_choices', None)
+            if choices is None:
+                choices = list(iter(formfield.choices))
+                request._group_choices = choices
+            formfield.choices = choices
+        return formfield
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -26,7 +122,19 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
+class CommentAdmin(ScalableAdmin):
+    list_display = ("pk", "text", "created", "author", "post")
+    list_select_related = ("author", "post")
+    autocomplete_fields = ("author", "post")
+
+
+class FollowAdmin(ScalableAdmin):
+    list_display = ("pk", "user", "author")
+    list_select_related = ("user", "author")
+    autocomplete_fields = ("user", "author")
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
-admin.site.register(Comment)
-admin.site.register(Follow)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
@@ -0,0 +1,199 @@
+"""JSON API только для чтения: те же ленты, что и HTML-страницы.
+
+Ответ - {"results": [...], "next": адрес или null, "previous": ...},
+страницы листаются курсором (?after= / ?before=), как ленты сайта.
+Параметр fields=id,text,... ограничивает и поля ответа, и колонки
+запроса: строки читаются через values_list вместе с автором и группой
+одним запросом, без создания моделей и без шаблонов.
+Ленты, общие для всех, отдают ETag по версиям лент (posts/fragments.py)
+и отвечают 304 без запроса к постам.
+"""
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers,
+                                set_response_etag)
+
+from . import timeline
+from .models import Group, Post, PostTag, Tag
+from .page_cache import (conditional_page, group_scope, index_scope,
+                         profile_scope, tag_scope)
+from .paginators import CursorPaginator
+
+User = get_user_model()
+
+PER_PAGE = 10
+MAX_PER_PAGE = 50
+IMAGE_STORAGE = Post._meta.get_field('image').storage
+
+
+def _image_url(name):
+    return IMAGE_STORAGE.url(name) if name else None
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+# поле ответа: (колонка запроса, преобразование значения)
+FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'html': ('text_html', None),
+    'pub_date': ('pub_date', _isoformat),
+    'author': ('author__username', None),
+    'group': ('group__slug', None),
+    'image': ('image', _image_url),
+}
+DEFAULT_FIELDS = ('id', 'text', 'pub_date', 'author', 'group', 'image')
+# без них не построить курсор
+REQUIRED_COLUMNS = ('id', 'pub_date')
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _error(status, detail):
+    return HttpResponse(
+        json.dumps({'detail': detail}, ensure_ascii=False),
+        content_type='application/json', status=status)
+
+
+def _fields(request):
+    raw = request.GET.get('fields')
+    if not raw:
+        return DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(
+        name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown or not fields:
+        raise BadRequest(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(FIELDS)}.')
+    return fields
+
+
+def _per_page(request):
+    try:
+        per_page = int(request.GET.get('limit', PER_PAGE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом.')
+    return min(max(per_page, 1), MAX_PER_PAGE)
+
+
+def _columns(fields):
+    return tuple(dict.fromkeys(
+        (*REQUIRED_COLUMNS, *(FIELDS[name][0] for name in fields))))
+
+
+def _serialize(rows, fields):
+    plan = [(name, *FIELDS[name]) for name in fields]
+    return [
+        {
+            name: convert(getattr(row, column)) if convert
+            else getattr(row, column)
+            for name, column, convert in plan
+        }
+        for row in rows
+    ]
+
+
+def _link(request, name, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query[name] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def _page(request, rows, key='id'):
+    return CursorPaginator(rows, _per_page(request), key=key).get_page(
+        after=request.GET.get('after'), before=request.GET.get('before'))
+
+
+def _respond(request, page_obj, rows, fields):
+    body = json.dumps({
+        'results': _serialize(rows, fields),
+        'next': _link(request, 'after', page_obj.next_cursor),
+        'previous': _link(request, 'before', page_obj.previous_cursor),
+    }, ensure_ascii=False, separators=(',', ':'))
+    return HttpResponse(body, content_type='application/json')
+
+
+def _feed(request, posts):
+    try:
+        fields = _fields(request)
+        page_obj = _page(request, posts.values_list(
+            *_columns(fields), named=True))
+    except BadRequest as error:
+        return _error(HTTPStatus.BAD_REQUEST, str(error))
+    return _respond(request, page_obj, page_obj, fields)
+
+
+@conditional_page(index_scope)
+def index(request):
+    return _feed(request, Post.objects.all())
+
+
+@conditional_page(group_scope)
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return _error(HTTPStatus.NOT_FOUND, 'Группа не найдена.')
+    return _feed(request, Post.objects.filter(group_id=group_id))
+
+
+@conditional_page(profile_scope)
+def profile(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return _error(HTTPStatus.NOT_FOUND, 'Пользователь не найден.')
+    return _feed(request, Post.objects.filter(author_id=author_id))
+
+
+def _entry_feed(request, entries):
+    """Лента из строк (pub_date, post_id): страница id, затем посты."""
+    try:
+        fields = _fields(request)
+        page_obj = _page(request, entries, key='post_id')
+    except BadRequest as error:
+        return _error(HTTPStatus.BAD_REQUEST, str(error))
+    ids = [entry.post_id for entry in page_obj]
+    posts = {
+        row.id: row for row in Post.objects.filter(pk__in=ids).order_by()
+        .values_list(*_columns(fields), named=True)
+    }
+    rows = [posts[pk] for pk in ids if pk in posts]
+    return _respond(request, page_obj, rows, fields)
+
+
+@conditional_page(tag_scope)
+def tag_posts(request, name):
+    tag_id = Tag.objects.filter(name=name.lower()).values_list(
+        'pk', flat=True).first()
+    if tag_id is None:
+        return _error(HTTPStatus.NOT_FOUND, 'Тег не найден.')
+    return _entry_feed(request, PostTag.objects.filter(
+        tag_id=tag_id).values_list('pub_date', 'post_id', named=True))
+
+
+def follow_index(request):
+    """Лента подписок: своя у каждого, поэтому ETag считается по телу."""
+    if not request.user.is_authenticated:
+        return _error(HTTPStatus.FORBIDDEN, 'Нужно войти на сайт.')
+    response = _entry_feed(request, timeline.follow_feed(request.user.pk))
+    if response.status_code != HTTPStatus.OK:
+        return response
+    set_response_etag(response)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return get_conditional_response(
+        request, etag=response['ETag'], response=response)
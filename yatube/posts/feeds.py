@@ -0,0 +1,109 @@
+"""RSS и Atom лент главной, групп и профилей.
+
+Готовый XML хранится в кэше под ключом из версий лент
+(posts/page_cache.py), которые меняют сигналы Post, поэтому
+программы чтения, опрашивающие ленту каждую минуту, получают 304
+или тело из кэша без запросов к базе.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from .models import Group, Post
+from .page_cache import (conditional_page, group_feed_scope,
+                         index_feed_scope, profile_feed_scope)
+
+User = get_user_model()
+
+FEED_SIZE = 20
+
+
+class PostFeed(Feed):
+    def items(self, obj):
+        return self.posts(obj).for_feed()[:FEED_SIZE]
+
+    def item_title(self, post):
+        return str(post)
+
+    def item_description(self, post):
+        return post.html
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=(post.pk,))
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_categories(self, post):
+        return (post.group.title,) if post.group else ()
+
+
+class IndexFeed(PostFeed):
+    title = 'Yatube: последние записи'
+    description = 'Новые записи на сайте'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+
+class GroupFeed(PostFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=(group.slug,))
+
+    def posts(self, group):
+        return Post.objects.filter(group=group)
+
+
+class ProfileFeed(PostFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=(author.username,))
+
+    def posts(self, author):
+        return Post.objects.filter(author=author)
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        # В Atom вместо description выводится subtitle.
+        description = self.description
+        return description(obj) if callable(description) else description
+
+
+def _feeds(feed, scope):
+    class Atom(AtomMixin, feed):
+        pass
+    cached = conditional_page(scope, cache_body=True)
+    return cached(feed()), cached(Atom())
+
+
+index_rss, index_atom = _feeds(IndexFeed, index_feed_scope)
+group_rss, group_atom = _feeds(GroupFeed, group_feed_scope)
+profile_rss, profile_atom = _feeds(ProfileFeed, profile_feed_scope)
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Post, Comment
+from .uploads import process_image
 
 
 class PostForm(forms.ModelForm):
@@ -8,6 +10,16 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        """Уменьшает новую картинку и запоминает её размеры в посте."""
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image, size = process_image(image)
+            self.instance.image_width, self.instance.image_height = size
+        elif not image:
+            self.instance.image_width = self.instance.image_height = None
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
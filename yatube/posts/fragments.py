@@ -0,0 +1,64 @@
+"""Версии кэшируемых фрагментов лент.
+
+Ключ {% cache %} включает номер версии ленты, поэтому фрагмент можно
+хранить долго: сигналы Post, Group и User увеличивают версию,
+и следующий запрос просто читает фрагмент под новым ключом.
+
+Версии:
+    feeds       - общая, меняется при правке групп и имён авторов;
+    index       - главная страница, меняется с любым постом;
+    group:<id>  - лента группы;
+    tag:<имя>   - лента тега;
+    author:<id> - лента профиля;
+    post:<id>   - страница поста с комментариями;
+    stats:<id>  - счётчики пользователя в профиле и на странице поста.
+"""
+import time
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'fragment-version:'
+CHANGED_PREFIX = 'fragment-changed:'
+GLOBAL = 'feeds'
+
+
+def _key(name):
+    return f'{KEY_PREFIX}{name}'
+
+
+def _changed_key(name):
+    return f'{CHANGED_PREFIX}{name}'
+
+
+def _initial():
+    # Не начинаем с 1: если версию вытеснили из кэша, старые фрагменты
+    # под прежними номерами не должны снова стать актуальными.
+    return time.time_ns()
+
+
+def get_versions(*names):
+    """Возвращает строку версий для ключа {% cache %}."""
+    keys = [_key(name) for name in (GLOBAL, *names)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial(), None)
+            versions[key] = cache.get(key) or _initial()
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def last_changed(*names):
+    """Время (unix) последнего изменения лент или None, если неизвестно."""
+    keys = [_changed_key(name) for name in (GLOBAL, *names)]
+    return max(cache.get_many(keys).values(), default=None)
+
+
+def bump(*names):
+    """Делает устаревшими фрагменты перечисленных лент."""
+    now = time.time()
+    for name in names:
+        try:
+            cache.incr(_key(name))
+        except ValueError:
+            cache.set(_key(name), _initial(), None)
+    cache.set_many({_changed_key(name): now for name in names}, None)
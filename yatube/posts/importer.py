@@ -0,0 +1,280 @@
+"""Массовый импорт постов и комментариев со старой платформы.
+
+Записи читаются из NDJSON или CSV потоком и вставляются пачками через
+bulk_create, каждая пачка - в своей транзакции. bulk_create не шлёт
+сигналов, поэтому то, что для одного поста делают posts/signals.py,
+здесь делается сразу для всей пачки: HTML и теги текста, ленты
+подписок и счётчики авторов.
+
+Поля записи поста: id, author (username), group (slug, можно пустым),
+text, pub_date (ISO 8601), image (путь к файлу, можно пустым).
+Поля комментария: id, post (id поста), author, text, created.
+Записи получают здешние id, а id старой платформы запоминаются
+в ImportedRecord: по ним комментарии находят свои посты, а уже
+импортированные записи при повторном запуске пропускаются. Так id
+старой платформы, совпавший с id здешнего поста, не смешивает записи.
+"""
+import csv
+import json
+import mimetypes
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from . import markup, stats, timeline
+from .export import parse_since
+from .models import IMAGE_DIRECTORY, Comment, Group, ImportedRecord, Post
+from .uploads import process_image
+
+User = get_user_model()
+
+IMAGE_STORAGE = Post._meta.get_field('image').storage
+
+
+class RecordError(ValueError):
+    pass
+
+
+def read(path):
+    """Записи файла словарями; формат определяется по расширению.
+
+    Вместо неразобранной строки NDJSON отдаётся RecordError, чтобы
+    она попала в ошибки импорта, а не остановила его.
+    """
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as file:
+            yield from csv.DictReader(file)
+        return
+    with open(path, 'rb') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                yield RecordError(f'строка не разобрана: {error}')
+                continue
+            yield (record if isinstance(record, dict)
+                   else RecordError('запись не объект JSON'))
+
+
+@contextmanager
+def explicit_dates(model):
+    """bulk_create с датами из файла, а не текущим временем.
+
+    auto_now_add иначе заменит дату при вставке; команда импорта
+    работает в своём процессе, поэтому флаг можно снять на время.
+    """
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def copy_image(path):
+    """Уменьшает картинку как при загрузке и сохраняет в хранилище.
+
+    Возвращает (имя, ширина, высота).
+    """
+    size = os.path.getsize(path)
+    content_type = mimetypes.guess_type(path)[0]
+    with open(path, 'rb') as file:
+        upload = UploadedFile(
+            file, os.path.basename(path), content_type, size)
+        image, (width, height) = process_image(upload)
+        name = IMAGE_STORAGE.save(IMAGE_DIRECTORY + image.name, image)
+    return name, width, height
+
+
+def assign_ids(model, objects):
+    """Выдаёт объектам id после самого большого в таблице.
+
+    bulk_create на SQLite не возвращает id, а они нужны для
+    ImportedRecord и лент, поэтому id задаются заранее, внутри
+    транзакции вставки.
+    """
+    start = (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    for pk, obj in enumerate(objects, start):
+        obj.pk = pk
+
+
+class Importer:
+    """Вставляет пачки записей одного вида и помнит найденные id.
+
+    Авторы ищутся в словаре username -> id, который дополняется
+    одним запросом на пачку, группы загружаются один раз целиком.
+    """
+
+    def __init__(self, kind, image_root='', workers=4):
+        self.kind = kind
+        self.image_root = image_root
+        self.workers = workers
+        self.authors = {}
+        self.groups = (dict(Group.objects.values_list('slug', 'pk'))
+                       if kind == 'posts' else {})
+        self.errors = []
+
+    def load_authors(self, records):
+        missing = {
+            record.get('author') for record in records
+            if isinstance(record, dict)
+            and isinstance(record.get('author'), str)
+        } - set(self.authors)
+        self.authors.update(User.objects.filter(
+            username__in=missing).values_list('username', 'pk'))
+
+    def author_id(self, record):
+        try:
+            return self.authors[record.get('author')]
+        except KeyError:
+            raise RecordError(f'нет автора {record.get("author")!r}')
+
+    def text(self, record):
+        text = record['text']
+        if not isinstance(text, str):
+            raise RecordError('нет текста')
+        return text
+
+    def build_post(self, record):
+        group = record.get('group') or None
+        if group is not None and group not in self.groups:
+            raise RecordError(f'нет группы {group!r}')
+        post = Post(
+            author_id=self.author_id(record),
+            group_id=self.groups.get(group),
+            text=self.text(record),
+            pub_date=parse_since(record['pub_date']),
+        )
+        post._source_id = int(record['id'])
+        post._image_path = record.get('image') or ''
+        if not isinstance(post._image_path, str):
+            raise RecordError('путь к картинке не строка')
+        return post
+
+    def build_comment(self, record):
+        comment = Comment(
+            author_id=self.author_id(record),
+            text=self.text(record),
+            created=parse_since(record['created']),
+        )
+        comment._source_id = int(record['id'])
+        comment._source_post = int(record['post'])
+        return comment
+
+    def build(self, records):
+        """Объекты для записей (номер, запись); ошибочные - в errors."""
+        self.load_authors([record for _, record in records])
+        build = (self.build_post if self.kind == 'posts'
+                 else self.build_comment)
+        objects = []
+        for number, record in records:
+            try:
+                if isinstance(record, RecordError):
+                    raise record
+                obj = build(record)
+            except (KeyError, TypeError, ValueError) as error:
+                self.errors.append((number, error))
+                continue
+            obj._number = number
+            objects.append(obj)
+        return objects
+
+    def skip_imported(self, objects):
+        """Убирает записи, импортированные раньше, и повторы id в пачке."""
+        done = set(ImportedRecord.objects.filter(
+            kind=self.kind,
+            source_id__in=[obj._source_id for obj in objects],
+        ).values_list('source_id', flat=True))
+        fresh, seen = [], set()
+        for obj in objects:
+            if obj._source_id in seen:
+                self.errors.append((obj._number, 'id повторяется в пачке'))
+            elif obj._source_id not in done:
+                fresh.append(obj)
+            seen.add(obj._source_id)
+        return fresh
+
+    def resolve_posts(self, comments):
+        """Находит здешние посты комментариев по id старой платформы."""
+        posts = dict(ImportedRecord.objects.filter(
+            kind='posts',
+            source_id__in={obj._source_post for obj in comments},
+        ).values_list('source_id', 'object_id'))
+        found = set(Post.objects.filter(
+            pk__in=posts.values()).values_list('pk', flat=True))
+        resolved = []
+        for obj in comments:
+            obj.post_id = posts.get(obj._source_post)
+            if obj.post_id in found:
+                resolved.append(obj)
+            else:
+                self.errors.append((obj._number, 'нет поста'))
+        return resolved
+
+    def attach_images(self, posts):
+        """Копирует картинки пачки в хранилище в несколько потоков."""
+        posts = [post for post in posts if post._image_path]
+        paths = [os.path.join(self.image_root, post._image_path)
+                 for post in posts]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(copy_image, path) for path in paths]
+        for post, future in zip(posts, futures):
+            try:
+                (post.image, post.image_width,
+                 post.image_height) = future.result()
+            except (OSError, ValidationError) as error:
+                # Пост всё равно нужен, без картинки.
+                self.errors.append(
+                    (post._number, f'картинка не скопирована: {error}'))
+
+    def insert(self, records):
+        """Вставляет пачку, возвращает число новых записей."""
+        model = Post if self.kind == 'posts' else Comment
+        objects = self.skip_imported(self.build(records))
+        if self.kind == 'comments':
+            objects = self.resolve_posts(objects)
+        else:
+            # Файлы копируются до транзакции, чтобы не держать
+            # блокировку базы. Если пачка не вставится, их уберёт
+            # collect_media_garbage.
+            self.attach_images(objects)
+            markup.prepare_many(objects)
+        if not objects:
+            return 0
+        with transaction.atomic(), explicit_dates(model):
+            assign_ids(model, objects)
+            model.objects.bulk_create(objects)
+            ImportedRecord.objects.bulk_create(
+                ImportedRecord(kind=self.kind, source_id=obj._source_id,
+                               object_id=obj.pk)
+                for obj in objects)
+            if self.kind == 'posts':
+                markup.index_new(objects)
+                timeline.push_posts(objects)
+            counter = ('posts_count' if self.kind == 'posts'
+                       else 'comments_count')
+            for author_id, count in Counter(
+                    obj.author_id for obj in objects).items():
+                stats.bump(author_id, counter, count)
+        return len(objects)
+
+
+def reset_sequences(model):
+    """После вставки с заданными id счётчик id базы должен их обогнать."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
@@ -0,0 +1,100 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from posts import stats, timeline
+from posts.models import Follow, Post, TimelineEntry
+from posts.paginators import CursorPaginator
+from posts.views import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Замеряет стоимость раскладки поста по лентам и слияния '
+            'ленты при чтении. Все данные создаются в транзакции '
+            'и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=5000,
+                            help='Подписчиков у автора.')
+        parser.add_argument('--pulled-authors', type=int, default=5,
+                            help='Авторов выше порога в ленте читателя.')
+        parser.add_argument('--posts', type=int, default=50,
+                            help='Постов у каждого автора.')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Повторов каждого замера.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def timed(self, func, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def create_users(self, prefix, count):
+        User.objects.bulk_create(
+            User(username=f'{prefix}{i}') for i in range(count))
+        return list(User.objects.filter(
+            username__startswith=prefix).values_list('pk', flat=True))
+
+    def run(self, followers, pulled_authors, posts, repeat, **options):
+        prefix = f'bench{time.monotonic_ns()}'
+        reader_ids = self.create_users(f'{prefix}_r', followers)
+        author = User.objects.create(username=f'{prefix}_author')
+        Follow.objects.bulk_create(
+            Follow(user_id=reader_id, author=author)
+            for reader_id in reader_ids)
+        # bulk_create не шлёт сигналы, счётчики подписчиков пересчитываем
+        stats.reconcile([author.pk])
+
+        self.stdout.write(
+            f'TIMELINE_PUSH_THRESHOLD = {settings.TIMELINE_PUSH_THRESHOLD}')
+        for threshold, label in ((followers, 'push'), (followers - 1, 'pull')):
+            with override_settings(TIMELINE_PUSH_THRESHOLD=threshold):
+                cost = self.timed(
+                    lambda: Post.objects.create(text='bench', author=author),
+                    repeat)
+            self.stdout.write(
+                f'Пост автора с {followers} подписчиками ({label}): '
+                f'{cost:.2f} мс')
+
+        # У "тяжёлых" авторов на одного подписчика больше, чем у author,
+        # поэтому при пороге followers подмешиваются только они.
+        celebrity_ids = self.create_users(f'{prefix}_c', pulled_authors)
+        Follow.objects.bulk_create(
+            Follow(user_id=user_id, author_id=celebrity_id)
+            for celebrity_id in celebrity_ids
+            for user_id in reader_ids + [author.pk])
+        stats.reconcile(celebrity_ids)
+        Post.objects.bulk_create(
+            Post(text='bench', author_id=celebrity_id)
+            for celebrity_id in celebrity_ids for _ in range(posts))
+        reader_id = reader_ids[0]
+
+        def read_page():
+            feed = timeline.follow_feed(reader_id)
+            page = CursorPaginator(feed, POSTS_PER_PAGE, key='post_id')
+            return page.get_page(after=page.get_page().next_cursor)
+
+        with override_settings(TIMELINE_PUSH_THRESHOLD=followers):
+            cost = self.timed(read_page, repeat)
+        entries = TimelineEntry.objects.filter(follower_id=reader_id).count()
+        self.stdout.write(
+            f'Две страницы follow_index: {entries} записей ленты + '
+            f'{pulled_authors} авторов по {posts} постов: {cost:.2f} мс')
@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails
+from posts.models import (IMAGE_DIRECTORY, VARIANT_DIRECTORY, ImageVariant,
+                          Post)
+
+# имена каталогов tempfile.mkdtemp()
+TMP_NAME = re.compile(r'^tmp[a-z0-9_]{8}$')
+
+
+def walk(root, directory='', after=''):
+    """Файлы под root в порядке сортировки путей, строго после after.
+
+    Каталог сортируется как имя с '/', тогда обход в глубину идёт
+    в том же порядке, что и сравнение строк, и уже пройденные
+    поддеревья пропускаются целиком, не читаясь с диска.
+    """
+    try:
+        entries = list(os.scandir(os.path.join(root, directory)))
+    except FileNotFoundError:
+        return
+    keyed = sorted(
+        (entry.name + ('/' if entry.is_dir() else ''), entry)
+        for entry in entries)
+    for key, entry in keyed:
+        path = directory + key
+        if not key.endswith('/'):
+            if path > after:
+                yield path, entry
+        elif after.startswith(path) or path > after:
+            yield from walk(root, path, after)
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки постов, варианты и миниатюры, на которые '
+            'больше ничего не ссылается, а также брошенные каталоги tmp*. '
+            'Обход сохраняет место остановки и продолжает с него.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Файлов на удаление за один раз.')
+        parser.add_argument('--max-batches', type=int, default=0,
+                            help='Остановиться после стольких пачек.')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Не трогать файлы моложе стольких секунд.')
+        parser.add_argument('--tmp-root', default=settings.BASE_DIR,
+                            help='Где искать брошенные каталоги tmp*.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, сколько освободится.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Начать обход сначала.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.dry_run = options['dry_run']
+        self.deadline = time.time() - options['min_age']
+        self.root = settings.MEDIA_ROOT
+        self.files = self.freed = 0
+        self.collect_tmp(options['tmp_root'])
+        after = '' if options['restart'] else self.load_checkpoint()
+        live = self.live_names()
+        finished = self.collect_orphans(live, after)
+        verb = 'Можно освободить' if self.dry_run else 'Освобождено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: {self.freed} байт, файлов и каталогов: {self.files}. '
+            + ('Обход завершён.' if finished else
+               'Обход прерван, следующий запуск продолжит его.')))
+
+    def live_names(self):
+        """Имена всех файлов, на которые ссылаются посты, по ходу чтения.
+
+        Миниатюры не хранятся в базе постов, но их имена вычисляются
+        по имени картинки так же, как это делает sorl-thumbnail.
+        """
+        live = set()
+        images = Post.objects.exclude(image='').values_list(
+            'image', flat=True)
+        for name in images.iterator(chunk_size=2000):
+            live.add(name)
+            for preset in settings.POST_THUMBNAILS:
+                live.add(thumbnails.thumbnail_file(name, preset).name)
+        live.update(ImageVariant.objects.values_list(
+            'file', flat=True).iterator(chunk_size=2000))
+        return live
+
+    def collect_orphans(self, live, after):
+        batch = []
+        batches = 0
+        for directory in sorted({IMAGE_DIRECTORY,
+                                 sorl_settings.THUMBNAIL_PREFIX}):
+            if after[:len(directory)] > directory:
+                continue
+            start = after if after.startswith(directory) else ''
+            for path, entry in walk(self.root, directory, start):
+                if path in live or entry.stat().st_mtime > self.deadline:
+                    continue
+                batch.append((path, entry.stat().st_size))
+                if len(batch) < self.options['batch_size']:
+                    continue
+                self.delete(batch)
+                self.save_checkpoint(path)
+                batch = []
+                batches += 1
+                if batches == self.options['max_batches']:
+                    return False
+        self.delete(batch)
+        self.save_checkpoint('')
+        return True
+
+    def delete(self, batch):
+        if not batch:
+            return
+        names = [path for path, _ in batch]
+        # Пока шёл обход, файл мог снова понадобиться: одинаковая
+        # картинка, загруженная заново, получает то же имя.
+        revived = set(Post.objects.filter(image__in=names).values_list(
+            'image', flat=True))
+        revived.update(ImageVariant.objects.filter(
+            file__in=names).values_list('file', flat=True))
+        for path, size in batch:
+            if path in revived:
+                continue
+            self.files += 1
+            self.freed += size
+            if self.options['verbosity'] > 1:
+                self.stdout.write(f'{path}: {size} байт')
+            if not self.dry_run:
+                self.remove(path)
+
+    def remove(self, path):
+        if path.startswith(sorl_settings.THUMBNAIL_PREFIX):
+            default.kvstore.delete(
+                ImageFile(path, default.storage), delete_thumbnails=False)
+        elif not path.startswith(VARIANT_DIRECTORY):
+            default.kvstore.delete(thumbnails.source_file(path))
+        full_path = os.path.join(self.root, path)
+        try:
+            os.remove(full_path)
+        except FileNotFoundError:
+            return
+        # опустевшие каталоги вида ab/cd/ тоже не нужны
+        directory = os.path.dirname(full_path)
+        try:
+            while directory != self.root:
+                os.rmdir(directory)
+                directory = os.path.dirname(directory)
+        except OSError:
+            pass
+
+    def collect_tmp(self, tmp_root):
+        for entry in os.scandir(tmp_root):
+            if (not TMP_NAME.match(entry.name) or not entry.is_dir()
+                    or entry.stat().st_mtime > self.deadline):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(directory, name))
+                for directory, _, names in os.walk(entry.path)
+                for name in names)
+            self.files += 1
+            self.freed += size
+            if self.options['verbosity'] > 1:
+                self.stdout.write(f'{entry.path}/: {size} байт')
+            if not self.dry_run:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def load_checkpoint(self):
+        try:
+            with open(settings.MEDIA_GC_CHECKPOINT) as file:
+                return json.load(file)['after']
+        except (OSError, ValueError, KeyError):
+            return ''
+
+    def save_checkpoint(self, after):
+        if self.dry_run:
+            return
+        with open(settings.MEDIA_GC_CHECKPOINT, 'w') as file:
+            json.dump({'after': after}, file)
@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Post, TimelineEntry
+from posts.paginators import CursorPaginator
+from posts.views import COMMENTS_PER_PAGE, POSTS_PER_PAGE
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN QUERY PLAN для запросов лент и сообщает '
+            'о полных сканах таблиц и временных B-tree для сортировки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plan', action='store_true',
+                            help='Печатать план каждого запроса целиком.')
+
+    def feed_queries(self):
+        limit = POSTS_PER_PAGE + 1
+        cursor = (timezone.now(), 1)
+        feeds = {
+            'index': Post.objects.for_feed(),
+            'group_posts': Post.objects.for_feed().filter(group_id=1),
+            'profile': Post.objects.for_feed().filter(author_id=1),
+        }
+        queries = {}
+        for name, posts in feeds.items():
+            paginator = CursorPaginator(posts, POSTS_PER_PAGE)
+            queries[name] = paginator.after_queryset()[:limit]
+            queries[f'{name} ?after='] = (
+                paginator.after_queryset(cursor)[:limit])
+            queries[f'{name} ?before='] = (
+                paginator.before_queryset(cursor)[:limit])
+        timeline_sources = {
+            'follow_index': TimelineEntry.objects.filter(follower_id=1),
+            'follow_index pull': Post.objects.filter(
+                author_id=1).annotate(post_id=F('pk')),
+        }
+        for name, rows in timeline_sources.items():
+            paginator = CursorPaginator(
+                rows.values_list('pub_date', 'post_id'),
+                POSTS_PER_PAGE, key='post_id')
+            queries[name] = paginator.after_queryset()[:limit]
+            queries[f'{name} ?after='] = (
+                paginator.after_queryset(cursor)[:limit])
+        queries['follow_index posts'] = (
+            Post.objects.for_feed().order_by()
+            .filter(pk__in=list(range(1, POSTS_PER_PAGE + 1))))
+        comments = CursorPaginator(
+            Comment.objects.filter(post_id=1).select_related('author'),
+            COMMENTS_PER_PAGE, date_field='created')
+        queries['post_detail comments'] = (
+            comments.after_queryset()[:COMMENTS_PER_PAGE + 1])
+        queries['post_comments ?after='] = (
+            comments.after_queryset(cursor)[:COMMENTS_PER_PAGE + 1])
+        queries['push_post followers'] = Follow.objects.filter(
+            author_id=1).values_list('user_id', flat=True)
+        queries['profile following'] = Follow.objects.filter(
+            author_id=1, user_id=2)
+        return queries
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'EXPLAIN QUERY PLAN поддерживается только для SQLite.')
+        problems = 0
+        for name, queryset in self.feed_queries().items():
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            issues = [
+                step for step in plan
+                if 'TEMP B-TREE' in step
+                or (step.startswith('SCAN') and 'USING' not in step)
+            ]
+            problems += bool(issues)
+            style = self.style.ERROR if issues else self.style.SUCCESS
+            self.stdout.write(style(f'{name}: {"; ".join(issues) or "OK"}'))
+            if options['verbose_plan']:
+                for step in plan:
+                    self.stdout.write(f'    {step}')
+        if problems:
+            raise CommandError(f'Запросов с полным сканом или сортировкой: '
+                               f'{problems}')
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты, комментарии или подписки в NDJSON, '
+            'не загружая таблицу в память. С --since и --after-id '
+            'выгружает только записи после отметки прошлой выгрузки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(export.EXPORTS))
+        parser.add_argument('--since',
+                            help='Дата отметки в ISO 8601.')
+        parser.add_argument('--after-id', type=int,
+                            help='id последней выгруженной записи.')
+        parser.add_argument('--output',
+                            help='Файл выгрузки, по умолчанию stdout.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=export.CHUNK_SIZE,
+                            help='Строк за одно чтение из базы.')
+
+    def handle(self, *args, **options):
+        name = options['name']
+        try:
+            since = (export.parse_since(options['since'])
+                     if options['since'] else None)
+        except ValueError as error:
+            raise CommandError(error)
+        columns = export.EXPORTS[name].columns
+        records = export.rows(name, since, options['after_id']).iterator(
+            chunk_size=options['chunk_size'])
+        output = (open(options['output'], 'w', encoding='utf-8')
+                  if options['output'] else self.stdout)
+        count = 0
+        last = None
+        try:
+            for last in records:
+                output.write(f'{export.line(columns, last)}\n')
+                count += 1
+        finally:
+            if output is not self.stdout:
+                output.close()
+        message = f'Выгружено записей: {count}'
+        if last is not None:
+            row = dict(zip(columns, last))
+            date = export.EXPORTS[name].date_field
+            message += '. Отметка: '
+            if date:
+                message += f'--since {row[date].isoformat()} '
+            message += f'--after-id {row["id"]}'
+        # Отметка в stderr, чтобы не смешиваться с выгрузкой в stdout.
+        self.stderr.write(message)
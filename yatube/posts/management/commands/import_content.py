@@ -0,0 +1,81 @@
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from posts import fragments, importer
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты или комментарии из NDJSON или CSV '
+            'пачками через bulk_create. После каждой пачки сохраняется '
+            'место остановки, прерванный импорт продолжается с него. '
+            'Формат записей описан в posts/importer.py.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=('posts', 'comments'))
+        parser.add_argument('path', help='Файл .ndjson, .jsonl или .csv.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Записей в одной транзакции.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Потоков для копирования картинок.')
+        parser.add_argument('--image-root', default='',
+                            help='Относительно чего указаны картинки.')
+        parser.add_argument('--checkpoint',
+                            help='Файл места остановки, по умолчанию '
+                                 '<path>.checkpoint.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Начать файл сначала.')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        self.checkpoint = (options['checkpoint']
+                           or f'{options["path"]}.checkpoint')
+        done = 0 if options['restart'] else self.load_checkpoint()
+        records = islice(
+            enumerate(importer.read(options['path']), 1), done, None)
+        batches = iter(
+            lambda: list(islice(records, options['batch_size'])), [])
+        loader = importer.Importer(
+            kind, options['image_root'], options['workers'])
+        started = time.monotonic()
+        read = created = failed = 0
+        for batch in batches:
+            created += loader.insert(batch)
+            read += len(batch)
+            done = batch[-1][0]
+            self.save_checkpoint(done)
+            fragments.bump(fragments.GLOBAL)
+            for number, error in loader.errors:
+                self.stderr.write(f'Запись {number}: {error}')
+            failed += len(loader.errors)
+            loader.errors.clear()
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f'Прочитано {done}, {self.rate(read, started)}')
+        importer.reset_sequences(Post if kind == 'posts' else Comment)
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано записей: {read}, создано: {created}, '
+            f'с ошибками: {failed}, {self.rate(read, started)}. '
+            + ('Миниатюры картинок построит pregenerate_thumbnails.'
+               if kind == 'posts' else '')))
+
+    def rate(self, read, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        return f'{read / elapsed:.0f} записей/с'
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint) as file:
+                return json.load(file)['done']
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def save_checkpoint(self, done):
+        # Через rename, чтобы сбой не оставил файл недописанным.
+        with open(f'{self.checkpoint}.tmp', 'w') as file:
+            json.dump({'done': done}, file)
+        os.replace(f'{self.checkpoint}.tmp', self.checkpoint)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import fragments, thumbnails, variants
+from posts.models import ImageVariant, Post
+
+
+class Command(BaseCommand):
+    help = ('Строит недостающие миниатюры и варианты картинок всех '
+            'постов, например загруженных до фоновой обработки.')
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').values_list(
+            'pk', 'image').order_by('pk')
+        with_variants = set(
+            ImageVariant.objects.values_list('post_id', flat=True))
+        count = failed = 0
+        for post_id, name in images.iterator():
+            try:
+                thumbnails.generate(name)
+                if post_id not in with_variants:
+                    variants.generate(post_id, name)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            count += 1
+        fragments.bump(fragments.GLOBAL)
+        style = self.style.ERROR if failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Обработано картинок: {count}, с ошибками: {failed}'))
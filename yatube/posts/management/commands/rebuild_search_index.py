@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.search import TABLE
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает полнотекстовый индекс постов по posts_post '
+            'и уплотняет его. Нужна после загрузки данных в обход '
+            'триггеров, например после восстановления из дампа.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Полнотекстовый поиск работает только '
+                               'на SQLite.')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {TABLE} ({TABLE}) VALUES ('rebuild')")
+            cursor.execute(
+                f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+            cursor.execute(f'SELECT count(*) FROM {TABLE}')
+            count = cursor.fetchone()[0]
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {count}'))
@@ -0,0 +1,71 @@
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+
+from posts import fragments
+from posts.models import Post
+from posts.storage import content_hash, hashed_name, is_hashed
+
+
+class Command(BaseCommand):
+    help = ('Переименовывает картинки постов по содержимому на месте, '
+            'склеивая одинаковые файлы. Уже переименованные картинки '
+            'пропускаются, поэтому прерванный запуск можно повторить.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='Постов за один проход.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет сделано.')
+
+    def handle(self, *args, **options):
+        self.storage = Post._meta.get_field('image').storage
+        self.dry_run = options['dry_run']
+        last_pk = 0
+        renamed = merged = missing = 0
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_pk).exclude(image='')
+                .order_by('pk').values_list('pk', 'image')
+                [:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            names = sorted({name for _, name in batch if not is_hashed(name)})
+            for name in names:
+                result = self.rehash(name)
+                renamed += result == 'renamed'
+                merged += result == 'merged'
+                missing += result is None
+            if names and not self.dry_run:
+                fragments.bump(fragments.GLOBAL)
+        self.stdout.write(self.style.SUCCESS(
+            f'Переименовано: {renamed}, совпало с уже сохранёнными: '
+            f'{merged}, не найдено: {missing}. Миниатюры новых имён '
+            f'построит pregenerate_thumbnails.'))
+
+    def rehash(self, name):
+        if not self.storage.exists(name):
+            self.stderr.write(f'{name}: файл не найден')
+            return None
+        with self.storage.open(name) as file:
+            new_name = hashed_name(name, content_hash(file))
+        result = 'merged' if self.storage.exists(new_name) else 'renamed'
+        if self.dry_run:
+            self.stdout.write(f'{name} -> {new_name} ({result})')
+            return result
+        if result == 'renamed':
+            self.link(self.storage.path(name), self.storage.path(new_name))
+        # Сначала новое имя появляется на диске и в базе,
+        # и только потом удаляется старое.
+        Post.objects.filter(image=name).update(image=new_name)
+        self.storage.delete(name)
+        return result
+
+    def link(self, source, target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
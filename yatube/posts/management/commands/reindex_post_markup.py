@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import fragments, markup
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Заново строит HTML текстов постов и индексы тегов '
+            'и упоминаний, например для постов, сохранённых до их '
+            'появления, или после переименования пользователей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Постов за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        last_pk = 0
+        count = 0
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk').only(
+                    'pk', 'text', 'pub_date')[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            # update() вместо save(): сигналы поста здесь не нужны.
+            with transaction.atomic():
+                for post in batch:
+                    markup.prepare(post)
+                    Post.objects.filter(pk=post.pk).update(
+                        text_html=post.text_html)
+                    markup.index(post)
+            count += len(batch)
+        fragments.bump(fragments.GLOBAL)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано постов: {count}'))
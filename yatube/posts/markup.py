@@ -0,0 +1,94 @@
+"""Теги (#тег) и упоминания (@username) в тексте постов.
+
+Текст разбирается один раз при сохранении поста (posts/signals.py):
+prepare() строит Post.text_html со ссылками, index() раскладывает
+теги и упоминания в PostTag и Mention. Ссылкой становится только
+упоминание существующего пользователя. Если HTML устарел, например
+после переименования пользователя, его перестраивает команда
+reindex_post_markup.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.text import normalize_newlines
+
+from .models import Mention, PostTag, Tag
+
+User = get_user_model()
+
+TAG_LENGTH = Tag._meta.get_field('name').max_length
+# & перед # - это сущность HTML вида &#x27; в уже экранированном тексте.
+TAG = re.compile(rf'(?<![\w&#])#(\w{{1,{TAG_LENGTH}}})(?!\w)')
+# Точка или дефис в конце - скорее знак препинания, чем часть имени.
+MENTION = re.compile(r'(?<![\w@])@([\w.+-]*\w)')
+
+
+def tags(text):
+    """Имена тегов текста в нижнем регистре."""
+    return {name.lower() for name in TAG.findall(text)}
+
+
+def mentions(text):
+    return set(MENTION.findall(text))
+
+
+def render(text, users):
+    """HTML текста: теги и упоминания из users ({username: id}) - ссылки."""
+    def tag_link(match):
+        url = reverse('posts:tag_posts', args=(match.group(1).lower(),))
+        return f'<a href="{url}">{match.group(0)}</a>'
+
+    def mention_link(match):
+        if match.group(1) not in users:
+            return match.group(0)
+        url = reverse('posts:profile', args=(match.group(1),))
+        return f'<a href="{url}">{match.group(0)}</a>'
+
+    html = TAG.sub(tag_link, escape(text))
+    html = MENTION.sub(mention_link, html)
+    return normalize_newlines(html).replace('\n', '<br>')
+
+
+def prepare(post):
+    """Заполняет post.text_html и запоминает упомянутых пользователей."""
+    prepare_many([post])
+
+
+def prepare_many(posts):
+    """prepare() для пачки постов одним запросом пользователей."""
+    names = [mentions(post.text) for post in posts]
+    users = dict(User.objects.filter(
+        username__in=set().union(*names)).values_list('username', 'pk'))
+    for post, post_names in zip(posts, names):
+        found = {name: users[name] for name in post_names if name in users}
+        post.text_html = render(post.text, found)
+        post._mentioned = set(found.values())
+
+
+def index(post, created=False):
+    """Заменяет теги и упоминания поста в PostTag и Mention.
+
+    У только что созданного поста удалять нечего.
+    """
+    if not created:
+        PostTag.objects.filter(post=post).delete()
+        Mention.objects.filter(post=post).delete()
+    index_new([post])
+
+
+def index_new(posts):
+    """Раскладывает теги и упоминания новых постов в PostTag и Mention."""
+    names = [tags(post.text) for post in posts]
+    all_names = set().union(*names)
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in all_names], ignore_conflicts=True)
+    tag_ids = dict(Tag.objects.filter(name__in=all_names).values_list(
+        'name', 'pk'))
+    PostTag.objects.bulk_create(
+        PostTag(tag_id=tag_ids[name], post=post, pub_date=post.pub_date)
+        for post, post_names in zip(posts, names) for name in post_names)
+    Mention.objects.bulk_create(
+        Mention(user_id=user_id, post=post, pub_date=post.pub_date)
+        for post in posts for user_id in getattr(post, '_mentioned', ()))
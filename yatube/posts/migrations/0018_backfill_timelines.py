@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+
+
+def backfill(apps, schema_editor):
+    """Раскладывает существующие посты по лентам подписок.
+
+    Таблица лент появилась в 0008 пустой, и без этого follow_index
+    оставался пустым до ручного запуска rebuild_timelines. Авторы
+    выше TIMELINE_PUSH_THRESHOLD не раскладываются, как и в
+    posts/timeline.py. Уже заполненные ленты не трогаются.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    if TimelineEntry.objects.exists():
+        return
+    pulled = (
+        Follow.objects.order_by().values('author_id')
+        .annotate(followers=Count('id'))
+        .filter(followers__gt=settings.TIMELINE_PUSH_THRESHOLD)
+        .values('author_id')
+    )
+    follows = Follow.objects.exclude(author_id__in=pulled).values_list(
+        'user_id', 'author_id')
+    batch = []
+    for follower_id, author_id in follows.iterator():
+        posts = Post.objects.filter(author_id=author_id).values_list(
+            'pk', 'pub_date')
+        for pk, pub_date in posts.iterator():
+            batch.append(TimelineEntry(
+                follower_id=follower_id, post_id=pk, pub_date=pub_date))
+            if len(batch) == BATCH_SIZE:
+                TimelineEntry.objects.bulk_create(
+                    batch, ignore_conflicts=True)
+                batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_comment_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,17 @@
 from django.db import models
 
 from django.contrib.auth import get_user_model
+from django.template.defaultfilters import linebreaksbr
+from django.utils.safestring import mark_safe
 
 from .const import COUNT
+from .storage import ContentAddressedStorage
 
 
 User = get_user_model()
 
 IMAGE_DIRECTORY = 'posts/'
+VARIANT_DIRECTORY = 'posts/variants/'
 
 
 class Group(models.Model):
@@ -27,6 +31,22 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для ленты: автор и группа одним запросом.
+
+        Выбираются только колонки, которые выводит includes/card.html,
+        и варианты картинок для srcset ещё одним запросом на страницу.
+        """
+        return self.select_related('author', 'group').prefetch_related(
+            'image_variants').only(
+            'id', 'text', 'text_html', 'pub_date', 'image', 'image_width',
+            'image_height', 'author', 'group',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__slug', 'group__title',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст нового поста',
                             help_text='Введите текст поста')
@@ -50,17 +70,43 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to=IMAGE_DIRECTORY,
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    # Размеры записывает PostForm: шаблонам не нужно открывать файл.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False)
+    # Текст со ссылками на теги и упоминания, его строит posts/markup.py
+    # при сохранении, чтобы шаблоны не разбирали текст заново.
+    text_html = models.TextField('HTML текста', blank=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=('-pub_date', '-id'),
+                         name='post_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_date_idx'),
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='post_group_date_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:COUNT]
 
+    @property
+    def html(self):
+        """Текст для шаблона: готовый HTML или текст с переносами строк."""
+        if self.text_html:
+            return mark_safe(self.text_html)
+        return linebreaksbr(self.text, autoescape=True)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -88,6 +134,12 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
+        indexes = [
+            models.Index(fields=('post', '-created', '-id'),
+                         name='comment_post_created_idx'),
+            models.Index(fields=('created', 'id'),
+                         name='comment_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:COUNT]
@@ -115,6 +167,195 @@ class Follow(models.Model):
                 fields=("user", "author"),
                 name="unique follow")
         ]
+        indexes = [
+            models.Index(fields=('author', 'user'),
+                         name='follow_author_user_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} -> {self.author.username}"
+
+
+class TimelineEntry(models.Model):
+    """Пост автора, заранее разложенный в ленту подписчика."""
+    follower = models.ForeignKey(
+        User,
+        related_name='timeline',
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('follower', 'post'),
+                name='unique timeline entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=('follower', '-pub_date', '-post'),
+                name='timeline_follower_post_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.follower_id} <- {self.post_id}'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые сигналами (posts/stats.py)."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    followings_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count}'
+
+
+class ImageVariant(models.Model):
+    """Уменьшенная копия картинки поста для srcset (posts/variants.py)."""
+    post = models.ForeignKey(
+        Post,
+        related_name='image_variants',
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+    )
+    preset = models.CharField('Пресет', max_length=32)
+    format = models.CharField('Формат', max_length=8)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    file = models.FileField('Файл', upload_to=VARIANT_DIRECTORY,
+                            max_length=255)
+
+    class Meta:
+        ordering = ('preset', 'format', 'width')
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('post', 'preset', 'format', 'width'),
+                name='unique image variant')
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} {self.preset} {self.width}w {self.format}'
+
+
+class Tag(models.Model):
+    name = models.CharField('Тег', max_length=64, unique=True)
+
+    class Meta:
+        ordering = ('name',)
+        verbose_name = 'Тег'
+        verbose_name_plural = 'Теги'
+
+    def __str__(self):
+        return self.name
+
+
+class PostTag(models.Model):
+    """Пост с тегом; дата поста повторена, чтобы лента тега шла по индексу."""
+    tag = models.ForeignKey(
+        Tag,
+        related_name='entries',
+        verbose_name='Тег',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='tag_entries',
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'Тег поста'
+        verbose_name_plural = 'Теги постов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('tag', 'post'),
+                name='unique post tag')
+        ]
+        indexes = [
+            models.Index(fields=('tag', '-pub_date', '-post'),
+                         name='post_tag_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.tag_id} <- {self.post_id}'
+
+
+class Mention(models.Model):
+    """Упоминание пользователя в посте."""
+    user = models.ForeignKey(
+        User,
+        related_name='mentions',
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='mention_entries',
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'Упоминание'
+        verbose_name_plural = 'Упоминания'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique mention')
+        ]
+        indexes = [
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='mention_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} <- {self.post_id}'
+
+
+class ImportedRecord(models.Model):
+    """Запись старой платформы и её id здесь (posts/importer.py)."""
+    kind = models.CharField('Вид', max_length=16)
+    source_id = models.BigIntegerField('id на старой платформе')
+    object_id = models.PositiveIntegerField('id записи')
+
+    class Meta:
+        verbose_name = 'Импортированная запись'
+        verbose_name_plural = 'Импортированные записи'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('kind', 'source_id'),
+                name='unique imported record')
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.source_id} -> {self.object_id}'
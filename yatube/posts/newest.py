@@ -0,0 +1,69 @@
+"""Отметка самого нового поста ленты (high-water mark) в кэше.
+
+Страница ленты раз в POLL_INTERVAL секунд спрашивает, есть ли посты
+новее её первого поста. Пока новых постов нет, ответ строится только
+по кэшу: отметка ленты не новее курсора страницы, значит, и считать
+нечего, а повторный опрос с тем же ETag получает 304. В базу запрос
+идёт, только когда отметка сдвинулась.
+
+Отметки:
+    index       - главная страница;
+    author:<id> - посты автора, по ним подмешиваются авторы, которых
+                  не раскладывают по лентам подписок (posts/timeline.py);
+    follow:<id> - лента подписок пользователя, её двигает раскладка.
+Отметка - пара (unix-время публикации, id поста). Ставится после
+коммита, иначе опрос увидел бы отметку раньше, чем сам пост.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = 'newest:'
+PULLED_PREFIX = 'newest-pulled:'
+TIMEOUT = 60 * 60 * 24
+# список "тяжёлых" авторов подписчика меняется редко
+PULLED_TIMEOUT = 60 * 5
+POLL_INTERVAL = 30
+
+
+def _key(name):
+    return f'{KEY_PREFIX}{name}'
+
+
+def key_of(post):
+    return post.pub_date.timestamp(), post.pk
+
+
+def get(*names):
+    """Самая новая отметка из перечисленных или None, если их нет."""
+    marks = cache.get_many([_key(name) for name in names]).values()
+    return max((tuple(mark) for mark in marks), default=None)
+
+
+def seed(name, mark):
+    """Кладёт отметку, найденную по базе, если её ещё нет в кэше."""
+    if mark is not None:
+        cache.add(_key(name), mark, TIMEOUT)
+
+
+def advance(names, post):
+    """После коммита сдвигает отметки лент на пост, если он новее."""
+    mark = key_of(post)
+
+    def store():
+        keys = [_key(name) for name in names]
+        current = cache.get_many(keys)
+        cache.set_many({
+            key: mark for key in keys
+            if key not in current or tuple(current[key]) < mark
+        }, TIMEOUT)
+    transaction.on_commit(store)
+
+
+def pulled(follower_id, load):
+    """id авторов подписчика, чьи посты не раскладываются, на пару минут."""
+    key = f'{PULLED_PREFIX}{follower_id}'
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = load(follower_id)
+        cache.set(key, author_ids, PULLED_TIMEOUT)
+    return author_ids
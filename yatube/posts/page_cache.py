@@ -0,0 +1,204 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Для каждой страницы scope-функция называет ленты (posts/fragments.py),
+от которых зависит страница, и самую свежую дату публикации в ней.
+Из них строятся ETag и Last-Modified: на If-None-Match и
+If-Modified-Since отвечаем 304 без рендеринга, а готовое тело ответа
+храним в кэше под ключом из ETag, куда входит и адрес со страницей.
+Устаревание наступает само, когда сигналы моделей меняют версии лент.
+"""
+import hashlib
+from functools import wraps
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date
+
+from . import fragments
+from .models import Comment, Group, Post, PostTag
+
+User = get_user_model()
+
+KEY_PREFIX = 'page:'
+TIMEOUT = 60 * 60 * 24
+
+
+def index_scope():
+    newest = Post.objects.aggregate(newest=Max('pub_date'))['newest']
+    return ('index',), newest
+
+
+def group_scope(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return None
+    newest = Post.objects.filter(group_id=group_id).aggregate(
+        newest=Max('pub_date'))['newest']
+    return (f'group:{group_id}',), newest
+
+
+def tag_scope(name):
+    name = name.lower()
+    newest = PostTag.objects.filter(tag__name=name).aggregate(
+        newest=Max('pub_date'))['newest']
+    return (f'tag:{name}',), newest
+
+
+def profile_scope(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return None
+    newest = Post.objects.filter(author_id=author_id).aggregate(
+        newest=Max('pub_date'))['newest']
+    return (f'author:{author_id}', f'stats:{author_id}'), newest
+
+
+def post_scope(post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'pub_date').first()
+    if post is None:
+        return None
+    newest_comment = Comment.objects.filter(post_id=post_id).aggregate(
+        newest=Max('created'))['newest']
+    newest = max(filter(None, (post['pub_date'], newest_comment)))
+    return (f'post:{post_id}', f'stats:{post["author_id"]}'), newest
+
+
+def _cached_pk(key, queryset):
+    """id объекта из кэша, чтобы не ходить в базу на каждый опрос.
+
+    Когда slug группы или имя пользователя переходит к другому объекту,
+    сигналы забывают старый id через forget_pk, иначе лента следила бы
+    за версиями прежнего объекта и отвечала 304 на новые посты.
+    """
+    pk = cache.get(f'{KEY_PREFIX}{key}')
+    if pk is None:
+        pk = queryset.values_list('pk', flat=True).first()
+        if pk is not None:
+            cache.set(f'{KEY_PREFIX}{key}', pk, TIMEOUT)
+    return pk
+
+
+def forget_pk(key):
+    cache.delete(f'{KEY_PREFIX}{key}')
+
+
+# Области RSS и Atom: хватает версий лент из кэша, так что
+# на опрос без изменений отвечаем 304, не обращаясь к базе.
+def index_feed_scope():
+    return ('index',), None
+
+
+def group_feed_scope(slug):
+    group_id = _cached_pk(f'group:{slug}', Group.objects.filter(slug=slug))
+    if group_id is None:
+        return None
+    return (f'group:{group_id}',), None
+
+
+def profile_feed_scope(username):
+    author_id = _cached_pk(
+        f'author:{username}', User.objects.filter(username=username))
+    if author_id is None:
+        return None
+    return (f'author:{author_id}',), None
+
+
+def _validators(request, names, newest):
+    """ETag и Last-Modified страницы по версиям лент и свежей дате."""
+    timestamps = [fragments.last_changed(*names)]
+    if newest is not None:
+        timestamps.append(newest.timestamp())
+    last_modified = int(max(filter(None, timestamps), default=0))
+    versions = fragments.get_versions(*names)
+    digest = hashlib.md5(
+        f'{request.build_absolute_uri()}|{versions}|{last_modified}'.encode()
+    ).hexdigest()
+    return digest, last_modified or None
+
+
+def _render(view, request, digest, *args, **kwargs):
+    """Тело страницы из кэша, а при промахе - от вьюхи с сохранением."""
+    cached = cache.get(f'{KEY_PREFIX}{digest}')
+    if cached is not None:
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+    response = view(request, *args, **kwargs)
+    if response.status_code == HTTPStatus.OK:
+        cache.set(
+            f'{KEY_PREFIX}{digest}',
+            (response.content, response['Content-Type']),
+            TIMEOUT,
+        )
+    return response
+
+
+def anonymous_page_cache(scope):
+    """Кэширует страницу для анонимов и отвечает 304 по валидаторам."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            found = scope(*args, **kwargs)
+            if found is None:
+                return view(request, *args, **kwargs)
+            digest, last_modified = _validators(request, *found)
+            etag = f'"{digest}"'
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = _render(view, request, digest, *args, **kwargs)
+                if response.status_code != HTTPStatus.OK:
+                    return response
+            _set_validators(response, etag, last_modified)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_page(scope, cache_body=False):
+    """ETag и Last-Modified по версиям лент для всех посетителей.
+
+    Подходит для ответов, которые не зависят от пользователя, например
+    API. С cache_body=True тело, как в anonymous_page_cache, хранится
+    в кэше, но для всех посетителей.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            found = None
+            if request.method in ('GET', 'HEAD'):
+                found = scope(*args, **kwargs)
+            if found is None:
+                return view(request, *args, **kwargs)
+            digest, last_modified = _validators(request, *found)
+            etag = f'"{digest}"'
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = (
+                    _render(view, request, digest, *args, **kwargs)
+                    if cache_body else view(request, *args, **kwargs))
+                if response.status_code != HTTPStatus.OK:
+                    return response
+            _set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
@@ -0,0 +1,208 @@
+import base64
+import binascii
+import heapq
+from collections.abc import Sequence
+from itertools import islice
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(obj, key='pk', date_field='pub_date'):
+    """Упаковывает ключ (дата, id) записи в токен для адресной строки."""
+    raw = f'{getattr(obj, date_field).isoformat()}|{getattr(obj, key)}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (pub_date, id) из токена или None, если токен битый."""
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        pub_date, pk = raw.rsplit('|', 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации.
+
+    Повторяет ту часть интерфейса django.core.paginator.Page,
+    которой пользуются шаблоны, но не знает ни номера страницы,
+    ни общего числа записей. Токены соседних страниц вычисляются
+    сразу, поэтому object_list можно подменить после выборки.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None, cursor=''):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.cursor = cursor
+        self.number = None
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинация по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Каждая страница читается одним запросом вида
+    WHERE (pub_date, id) < (?, ?) ORDER BY pub_date DESC, id DESC LIMIT n+1,
+    лишняя запись нужна только чтобы узнать, есть ли следующая страница.
+    Условие pub_date <= ? вынесено отдельно, чтобы SQLite начинал
+    чтение индекса сразу с курсора, а не отбрасывал более новые записи.
+    key - поле, которое разбивает совпадения pub_date (по умолчанию pk),
+    date_field - поле даты, если лента упорядочена не по pub_date.
+    """
+
+    def __init__(self, object_list, per_page, key='pk',
+                 date_field='pub_date'):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.key = key
+        self.date_field = date_field
+
+    def get_page(self, after=None, before=None):
+        before_key = decode_cursor(before)
+        if before_key is not None:
+            return self._page_before(before_key, before)
+        after_key = decode_cursor(after)
+        return self._page_after(after_key, after if after_key else '')
+
+    def after_queryset(self, key=None):
+        """Записи, идущие в ленте после ключа (pub_date, id)."""
+        date = self.date_field
+        posts = self.object_list.order_by(f'-{date}', f'-{self.key}')
+        if key is None:
+            return posts
+        pub_date, pk = key
+        return posts.filter(
+            Q(**{f'{date}__lte': pub_date}),
+            Q(**{f'{date}__lt': pub_date}) | Q(**{f'{self.key}__lt': pk}),
+        )
+
+    def before_queryset(self, key):
+        """Записи, идущие в ленте перед ключом, от ближайшей к ключу."""
+        date = self.date_field
+        pub_date, pk = key
+        return self.object_list.order_by(date, self.key).filter(
+            Q(**{f'{date}__gte': pub_date}),
+            Q(**{f'{date}__gt': pub_date}) | Q(**{f'{self.key}__gt': pk}),
+        )
+
+    def _page_after(self, key, token):
+        posts = self.after_queryset(key)
+        rows = list(posts[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return self._page(rows, has_next, key is not None,
+                          f'a:{token}' if token else '')
+
+    def _page_before(self, key, token):
+        posts = self.before_queryset(key)
+        rows = list(posts[:self.per_page + 1])
+        if len(rows) <= self.per_page:
+            # Дошли до начала ленты: отдаём обычную первую страницу,
+            # чтобы она не оказалась короче остальных.
+            return self._page_after(None, '')
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return self._page(rows, True, True, f'b:{token}')
+
+    def _page(self, rows, has_next, has_previous, cursor):
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=(
+                encode_cursor(rows[-1], self.key, self.date_field)
+                if has_next and rows else None),
+            previous_cursor=(
+                encode_cursor(rows[0], self.key, self.date_field)
+                if has_previous and rows else None),
+            cursor=cursor,
+        )
+
+
+class MergedFeed:
+    """k-way слияние нескольких упорядоченных лент в одну.
+
+    Каждый источник - QuerySet строк с полями pub_date и post_id.
+    Ленту можно отдать и Paginator, и CursorPaginator(key='post_id'):
+    order_by() и filter() применяются к каждому источнику, а срез
+    сливает по heapq.merge не больше stop строк из каждого.
+    """
+
+    def __init__(self, sources, reverse=True):
+        self.sources = list(sources)
+        self.reverse = reverse
+
+    def order_by(self, *fields):
+        return MergedFeed(
+            [source.order_by(*fields) for source in self.sources],
+            reverse=fields[0].startswith('-'),
+        )
+
+    def filter(self, *args, **kwargs):
+        return MergedFeed(
+            [source.filter(*args, **kwargs) for source in self.sources],
+            reverse=self.reverse,
+        )
+
+    def count(self):
+        return sum(source.count() for source in self.sources)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return self._merge()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return list(islice(self._merge(index + 1), index, index + 1))[0]
+        start = index.start or 0
+        return list(islice(self._merge(index.stop), start, index.stop))
+
+    def _merge(self, limit=None):
+        sources = [
+            source if limit is None else source[:limit]
+            for source in self.sources
+        ]
+        merged = heapq.merge(
+            *sources,
+            key=lambda row: (row.pub_date, row.post_id),
+            reverse=self.reverse,
+        )
+        last = None
+        for row in merged:
+            # Пост может оказаться в двух источниках, если автор
+            # перешёл порог уже после того, как его посты разложили.
+            if row.post_id != last:
+                yield row
+            last = row.post_id
@@ -0,0 +1,117 @@
+"""Полнотекстовый поиск по постам через FTS5 в SQLite.
+
+Индекс posts_post_fts хранит только слова, сам текст берётся из
+posts_post. Триггеры из миграции 0015_post_search обновляют индекс
+при любом изменении Post.text, в том числе через update();
+команда rebuild_search_index перестраивает его целиком.
+Каждое слово запроса ищется как префикс: для русского это заменяет
+стемминг. Выдача упорядочена по bm25 и листается курсором
+(ранг, id), как ленты - курсором (pub_date, id).
+"""
+import base64
+import binascii
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginators import CursorPage
+
+TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+MAX_WORDS = 10
+SNIPPET_WORDS = 24
+# Границы совпадений в snippet(): текст поста экранируется целиком,
+# и только потом они превращаются в <mark>.
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def match_expression(query):
+    """Запрос FTS5 из слов строки поиска; пустая строка, если слов нет."""
+    words = WORD.findall(query.lower())[:MAX_WORDS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def encode_cursor(rank, pk):
+    raw = f'{rank!r}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (ранг, id) из токена или None, если токен битый."""
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        rank, pk = raw.rsplit('|', 1)
+        return float(rank), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def matching(queryset, query):
+    """Посты queryset, подходящие под запрос, без ранжирования."""
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+        [match_expression(query)]))
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(
+        MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def _ranked_ids(expression, key, limit):
+    sql = f'SELECT rowid, rank FROM {TABLE} WHERE {TABLE} MATCH %s'
+    params = [expression]
+    if key is not None:
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [key[0], key[0], key[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _snippets(expression, ids):
+    # Фрагменты строятся отдельным запросом только для постов
+    # страницы, а не для всех совпадений до сортировки.
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, snippet({TABLE}, 0, %s, %s, %s, %s) '
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s '
+            f'AND rowid IN ({placeholders})',
+            [MARK_START, MARK_END, '…', SNIPPET_WORDS, expression, *ids])
+        return dict(cursor.fetchall())
+
+
+def search(query, after=None, per_page=10):
+    """Страница результатов поиска: посты с атрибутом snippet."""
+    expression = match_expression(query)
+    if not expression:
+        return CursorPage([], None)
+    key = decode_cursor(after)
+    rows = _ranked_ids(expression, key, per_page + 1)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    ids = [pk for pk, _ in rows]
+    posts = Post.objects.for_feed().in_bulk(ids) if ids else {}
+    snippets = _snippets(expression, ids) if ids else {}
+    results = []
+    for pk in ids:
+        # пост могли удалить между запросами
+        if pk in posts:
+            posts[pk].snippet = highlight(snippets.get(pk, ''))
+            results.append(posts[pk])
+    next_cursor = None
+    if has_next:
+        pk, rank = rows[-1]
+        next_cursor = encode_cursor(rank, pk)
+    return CursorPage(results, None, next_cursor=next_cursor,
+                      cursor=after if key else '')
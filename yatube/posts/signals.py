@@ -0,0 +1,174 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (fragments, markup, newest, page_cache, stats, thumbnails,
+               timeline)
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# поля автора, которые выводятся в карточке поста
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name')
+
+
+# Счётчики подключены первыми: timeline.is_pulled читает followers_count.
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Follow)
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        update_counters(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Follow)
+def count_deleted(sender, instance, **kwargs):
+    update_counters(sender, instance, -1)
+
+
+def update_counters(model, instance, delta):
+    for field, (counted_model, user_field) in stats.COUNTERS.items():
+        if counted_model is model:
+            user_id = getattr(instance, f'{user_field}_id')
+            stats.bump(user_id, field, delta)
+            fragments.bump(f'stats:{user_id}')
+
+
+@receiver(post_save, sender=Post)
+def push_to_timelines(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.push_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def advance_newest(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        newest.advance(('index', f'author:{instance.author_id}'), instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, raw=False, **kwargs):
+    instance._old_group_id = instance._old_image = None
+    instance._old_text = None
+    if instance.pk and not raw:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image', 'text').first()
+        if previous:
+            (instance._old_group_id, instance._old_image,
+             instance._old_text) = previous
+
+
+@receiver(pre_save, sender=Post)
+def render_markup(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if not instance.text_html or instance.text != instance._old_text:
+        markup.prepare(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_markup(sender, instance, created, raw=False, **kwargs):
+    # _mentioned появляется, только если текст разбирался заново.
+    if not raw and hasattr(instance, '_mentioned'):
+        markup.index(instance, created)
+        del instance._mentioned
+
+
+def post_feeds(instance):
+    """Ленты, в которые попадает пост."""
+    group_ids = {instance.group_id, getattr(instance, '_old_group_id', None)}
+    tags = markup.tags(instance.text) | markup.tags(
+        getattr(instance, '_old_text', None) or '')
+    return (
+        'index',
+        f'author:{instance.author_id}',
+        f'post:{instance.pk}',
+        *(f'group:{group_id}' for group_id in group_ids if group_id),
+        *(f'tag:{name}' for name in sorted(tags)),
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def expire_post_fragments(sender, instance, **kwargs):
+    fragments.bump(*post_feeds(instance))
+
+
+@receiver(post_save, sender=Post)
+def queue_thumbnails(sender, instance, raw=False, **kwargs):
+    name = instance.image.name
+    if raw or not name or name == getattr(instance, '_old_image', None):
+        return
+    feeds = post_feeds(instance)
+    transaction.on_commit(
+        lambda: thumbnails.enqueue(instance.pk, name, feeds))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def expire_comment_fragments(sender, instance, **kwargs):
+    fragments.bump(f'post:{instance.post_id}')
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, raw=False, **kwargs):
+    instance._old_slug = None
+    if not raw and instance.pk:
+        instance._old_slug = Group.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def expire_group_fragments(sender, instance, **kwargs):
+    fragments.bump(fragments.GLOBAL)
+    for slug in {instance.slug, getattr(instance, '_old_slug', None)}:
+        if slug:
+            page_cache.forget_pk(f'group:{slug}')
+
+
+@receiver(pre_save, sender=User)
+def remember_author_name(sender, instance, update_fields=None, raw=False,
+                         **kwargs):
+    instance._name_changed = False
+    instance._old_username = None
+    if raw or not instance.pk:
+        return
+    if update_fields and not set(update_fields) & set(AUTHOR_FIELDS):
+        return
+    old = User.objects.filter(pk=instance.pk).values(*AUTHOR_FIELDS).first()
+    instance._name_changed = old is not None and any(
+        old[field] != getattr(instance, field) for field in AUTHOR_FIELDS)
+    if old is not None and old['username'] != instance.username:
+        instance._old_username = old['username']
+
+
+@receiver(post_save, sender=User)
+def expire_author_fragments(sender, instance, created, **kwargs):
+    if getattr(instance, '_name_changed', False):
+        fragments.bump(fragments.GLOBAL)
+    old_username = getattr(instance, '_old_username', None)
+    if created or old_username:
+        page_cache.forget_pk(f'author:{instance.username}')
+    if old_username:
+        page_cache.forget_pk(f'author:{old_username}')
+
+
+@receiver(post_delete, sender=User)
+def expire_deleted_author_fragments(sender, instance, **kwargs):
+    fragments.bump(fragments.GLOBAL)
+    page_cache.forget_pk(f'author:{instance.username}')
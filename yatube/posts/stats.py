@@ -0,0 +1,79 @@
+"""Денормализованные счётчики пользователя (UserStats).
+
+Счётчики меняются атомарным UPDATE ... SET x = x + 1 из сигналов
+Post, Comment и Follow, поэтому профиль и страница поста не делают
+COUNT(*). Строка статистики создаётся пересчётом при первом обращении,
+расхождения исправляет команда reconcile_user_stats.
+"""
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, UserStats
+
+# поле счётчика -> (модель, поле пользователя в ней)
+COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'comments_count': (Comment, 'author'),
+    'followers_count': (Follow, 'author'),
+    'followings_count': (Follow, 'user'),
+}
+
+
+def compute(user_ids):
+    """Считает счётчики по исходным таблицам: {user_id: {поле: число}}."""
+    result = {user_id: dict.fromkeys(COUNTERS, 0) for user_id in user_ids}
+    for field, (model, user_field) in COUNTERS.items():
+        rows = (
+            model.objects.filter(**{f'{user_field}__in': user_ids})
+            .order_by()
+            .values_list(user_field)
+            .annotate(total=Count('pk'))
+        )
+        for user_id, total in rows:
+            result[user_id][field] = total
+    return result
+
+
+def get_stats(user_id):
+    """Возвращает статистику пользователя, создавая её при необходимости."""
+    try:
+        return UserStats.objects.get(user_id=user_id)
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.get_or_create(
+            user_id=user_id, defaults=compute([user_id])[user_id])
+        return stats
+
+
+def bump(user_id, field, delta):
+    """Атомарно сдвигает счётчик на delta."""
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gt': 0})
+    updated = stats.update(**{field: F(field) + delta})
+    if not updated and delta > 0:
+        # Строки ещё нет: пересчёт уже учитывает только что созданную
+        # запись. При удалении не создаём - пользователь может удаляться
+        # вместе со своими постами.
+        get_stats(user_id)
+
+
+def reconcile(user_ids):
+    """Приводит счётчики к исходным таблицам.
+
+    Возвращает число созданных или исправленных строк.
+    """
+    actual = compute(user_ids)
+    existing = UserStats.objects.in_bulk(user_ids)
+    to_create = []
+    to_update = []
+    for user_id, counters in actual.items():
+        stats = existing.get(user_id)
+        if stats is None:
+            to_create.append(UserStats(user_id=user_id, **counters))
+        elif any(getattr(stats, field) != value
+                 for field, value in counters.items()):
+            for field, value in counters.items():
+                setattr(stats, field, value)
+            to_update.append(stats)
+    UserStats.objects.bulk_create(to_create, ignore_conflicts=True)
+    UserStats.objects.bulk_update(to_update, list(COUNTERS))
+    return len(to_create) + len(to_update)
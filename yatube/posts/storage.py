@@ -0,0 +1,51 @@
+"""Хранилище картинок постов с именами по содержимому.
+
+Файл сохраняется как <каталог>/ab/cd/<sha256><расширение>: одинаковые
+байты получают одно имя, поэтому повторная загрузка той же картинки
+не создаёт копию, а sorl-thumbnail и posts/variants.py находят уже
+построенные для неё миниатюры. Файлы могут принадлежать нескольким
+постам, удаляет их только сборщик мусора, а не пост.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME = re.compile(
+    r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def is_hashed(name):
+    """Уже ли файл назван по содержимому."""
+    return bool(HASHED_NAME.search(name))
+
+
+def content_hash(content):
+    """sha256 файла, прочитанного по частям."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    directory = os.path.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    return os.path.join(
+        directory, digest[:2], digest[2:4], f'{digest}{extension}')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(name, content_hash(content))
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
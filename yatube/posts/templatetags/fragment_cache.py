@@ -0,0 +1,14 @@
+from django import template
+
+from posts.fragments import get_versions
+
+register = template.Library()
+
+
+@register.simple_tag
+def fragment_version(*parts):
+    """Версия ленты для {% cache %}.
+
+    {% fragment_version 'group' group.pk as version %}
+    """
+    return get_versions(':'.join(str(part) for part in parts))
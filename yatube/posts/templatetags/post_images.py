@@ -0,0 +1,35 @@
+from django import template
+
+from posts import thumbnails, variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, preset):
+    """Готовая миниатюра: {% post_thumbnail post.image 'card' as im %}."""
+    return thumbnails.cached(image, preset)
+
+
+@register.inclusion_tag('includes/picture.html', takes_context=True)
+def post_picture(context, post, preset):
+    """Картинка поста с srcset: {% post_picture post 'card' %}.
+
+    Варианты берутся из post.image_variants, выбранных вместе с постом,
+    миниатюра для поста без вариантов - из page_obj.thumbnails, где
+    она найдена сразу для всей страницы.
+    """
+    picture = thumbnail = None
+    if post.image:
+        picture = variants.picture(post.image_variants.all(), preset)
+    if post.image and picture is None:
+        page_thumbnails = getattr(context.get('page_obj'), 'thumbnails', None)
+        if page_thumbnails is not None and page_thumbnails.preset == preset:
+            thumbnail = page_thumbnails.get(post)
+        else:
+            thumbnail = thumbnails.cached(post.image, preset)
+    return {
+        'post': post,
+        'picture': picture,
+        'thumbnail': thumbnail,
+    }
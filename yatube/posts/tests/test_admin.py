@@ -0,0 +1,98 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..admin import IndexedDatesQuerySet
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ScalableAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Group.objects.create(title='Другая', slug='other')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_rows(self, count):
+        start = User.objects.count()
+        for number in range(start, start + count):
+            author = User.objects.create_user(f'author{number}')
+            post = Post.objects.create(
+                author=author, group=self.group, text=f'кот {number}')
+            Comment.objects.create(post=post, author=author, text='текст')
+            Follow.objects.create(user=self.admin, author=author)
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:posts_{model}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Ни строки, ни выбор группы в list_editable не дают N+1."""
+        self.create_rows(2)
+        before = {model: self.changelist_queries(model)
+                  for model in ('post', 'comment', 'follow')}
+        self.create_rows(5)
+        for model, count in before.items():
+            with self.subTest(model=model):
+                self.assertEqual(self.changelist_queries(model), count)
+
+    def test_changelist_skips_exact_count(self):
+        self.create_rows(3)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertFalse(any('COUNT(' in query['sql'].upper()
+                             for query in queries))
+
+    def test_search_uses_full_text_index(self):
+        self.create_rows(3)
+        Post.objects.filter(text='кот 1').update(text='собака')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'собака'})
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['собака'])
+        self.assertTrue(any('posts_post_fts' in query['sql']
+                            for query in queries))
+
+    def test_indexed_dates(self):
+        """Периоды находятся по одному запросу на каждый."""
+        posts = [Post.objects.create(author=self.admin, text=str(day))
+                 for day in range(4)]
+        dates = (datetime.datetime(2021, 12, 31, 23),
+                 datetime.datetime(2022, 1, 5), datetime.datetime(2022, 1, 5),
+                 datetime.datetime(2022, 3, 1))
+        for post, date in zip(posts, dates):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.make_aware(date))
+        queryset = IndexedDatesQuerySet(Post)
+        self.assertEqual(
+            list(queryset.dates('pub_date', 'year')),
+            [datetime.date(2021, 1, 1), datetime.date(2022, 1, 1)])
+        self.assertEqual(
+            list(queryset.dates('pub_date', 'month', order='DESC')),
+            [datetime.date(2022, 3, 1), datetime.date(2022, 1, 1),
+             datetime.date(2021, 12, 1)])
+        with CaptureQueriesContext(connection) as queries:
+            days = queryset.filter(pub_date__year=2022).dates(
+                'pub_date', 'day')
+        self.assertEqual(
+            days, [datetime.date(2022, 1, 5), datetime.date(2022, 3, 1)])
+        self.assertEqual(len(queries), 3)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'pub_date__year': 2022})
+        self.assertContains(response, 'pub_date__month=3')
@@ -0,0 +1,113 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'пост #кот {i}')
+            for i in range(13)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_paginated_by_cursor(self):
+        """Все ленты отдают те же посты по порядку, страница за страницей."""
+        self.client.force_login(self.reader)
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_posts', args=(self.group.slug,)),
+            reverse('api:profile', args=(self.author.username,)),
+            reverse('api:tag_posts', args=('Кот',)),
+            reverse('api:follow_index'),
+        )
+        expected = [post.pk for post in reversed(self.posts)]
+        for url in urls:
+            with self.subTest(url=url):
+                seen = []
+                while url:
+                    data = self.client.get(url).json()
+                    seen.extend(item['id'] for item in data['results'])
+                    url = data['next']
+                self.assertEqual(seen, expected)
+
+    def test_fields_limit_selected_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('api:index'), {'fields': 'author,group,id'})
+        item = response.json()['results'][0]
+        self.assertEqual(
+            item, {'author': 'author', 'group': 'group',
+                   'id': self.posts[-1].pk})
+        feed_queries = [query['sql'] for query in queries
+                        if 'FROM "posts_post"' in query['sql']
+                        and 'LIMIT 11' in query['sql']]
+        self.assertEqual(len(feed_queries), 1)
+        self.assertNotIn('"text"', feed_queries[0])
+        self.assertIn('JOIN "auth_user"', feed_queries[0])
+        self.assertIn('JOIN "posts_group"', feed_queries[0])
+
+    def test_default_fields(self):
+        item = self.client.get(reverse('api:index')).json()['results'][0]
+        post = self.posts[-1]
+        self.assertEqual(item, {
+            'id': post.pk,
+            'text': post.text,
+            'pub_date': post.pub_date.isoformat(),
+            'author': 'author',
+            'group': 'group',
+            'image': None,
+        })
+
+    def test_bad_requests(self):
+        cases = (
+            (reverse('api:index'), {'fields': 'text,password'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:index'), {'limit': 'many'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:group_posts', args=('missing',)), {},
+             HTTPStatus.NOT_FOUND),
+            (reverse('api:follow_index'), {}, HTTPStatus.FORBIDDEN),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_not_modified_until_feed_changes(self):
+        url = reverse('api:group_posts', args=(self.group.slug,))
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertFalse(any('LIMIT 11' in query['sql'] for query in queries))
+        Post.objects.create(author=self.author, group=self.group, text='new')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_follow_feed_etag_from_body(self):
+        self.client.force_login(self.reader)
+        url = reverse('api:follow_index')
+        response = self.client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
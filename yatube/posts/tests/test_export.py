@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.author = User.objects.create_user(username='author')
+        cls.posts = [Post.objects.create(author=cls.author, text=f'пост {i}')
+                     for i in range(5)]
+        # одна дата на два поста: отметке нужен и id
+        Post.objects.filter(pk=cls.posts[3].pk).update(
+            pub_date=cls.posts[2].pub_date)
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text='коммент')
+        Follow.objects.create(user=cls.staff, author=cls.author)
+
+    def lines(self, response):
+        body = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_staff_only(self):
+        url = reverse('posts:export', args=('posts',))
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(
+            reverse('posts:export', args=('users',))).status_code, 404)
+
+    def test_streams_all_rows(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('posts:export', args=('posts',)))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'],
+                         'application/x-ndjson; charset=utf-8')
+        rows = self.lines(response)
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [post.pk for post in self.posts])
+        self.assertEqual(rows[0]['text'], 'пост 0')
+        self.assertEqual(rows[0]['author_id'], self.author.pk)
+        for name, model in (('comments', Comment), ('follows', Follow)):
+            with self.subTest(name=name):
+                rows = self.lines(self.client.get(
+                    reverse('posts:export', args=(name,))))
+                self.assertEqual([row['id'] for row in rows],
+                                 list(model.objects.values_list(
+                                     'pk', flat=True)))
+
+    def test_watermark(self):
+        """После отметки (дата, id) идут только более новые записи."""
+        self.client.force_login(self.staff)
+        url = reverse('posts:export', args=('posts',))
+        mark = self.lines(self.client.get(url))[2]
+        rows = self.lines(self.client.get(
+            url, {'since': mark['pub_date'], 'after_id': mark['id']}))
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts[3:]])
+        response = self.client.get(url, {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.ndjson')
+            err = StringIO()
+            call_command('export_ndjson', 'posts', output=path,
+                         chunk_size=2, after_id=self.posts[1].pk,
+                         since=self.posts[1].pub_date.isoformat(),
+                         stderr=err)
+            with open(path, encoding='utf-8') as export:
+                rows = [json.loads(line) for line in export]
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts[2:]])
+        self.assertIn(f'--after-id {self.posts[4].pk}', err.getvalue())
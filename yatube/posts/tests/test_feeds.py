@@ -0,0 +1,103 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..feeds import FEED_SIZE
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Классики', slug='classics', description='Про классиков')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Глава {i}')
+            for i in range(FEED_SIZE + 1)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_list_latest_posts(self):
+        urls = (
+            reverse('posts:index_rss'),
+            reverse('posts:index_atom'),
+            reverse('posts:group_rss', args=(self.group.slug,)),
+            reverse('posts:group_atom', args=(self.group.slug,)),
+            reverse('posts:profile_rss', args=(self.author.username,)),
+            reverse('posts:profile_atom', args=(self.author.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('xml', response['Content-Type'])
+                self.assertContains(response, f'Глава {FEED_SIZE}')
+                self.assertNotContains(response, 'Глава 0<')
+        self.assertContains(
+            self.client.get(reverse('posts:group_atom',
+                                    args=(self.group.slug,))),
+            '<subtitle>Про классиков</subtitle>')
+
+    def test_unknown_group_or_author(self):
+        for url in (reverse('posts:group_rss', args=('missing',)),
+                    reverse('posts:profile_atom', args=('missing',))):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code,
+                                 HTTPStatus.NOT_FOUND)
+
+    def test_poll_without_changes_skips_database(self):
+        url = reverse('posts:group_rss', args=(self.group.slug,))
+        response = self.client.get(url)
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(queries), 0)
+        self.assertContains(response, f'Глава {FEED_SIZE}')
+
+    def test_new_post_invalidates_feed(self):
+        url = reverse('posts:profile_rss', args=(self.author.username,))
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.author, text='Эпилог')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Эпилог')
+
+    def test_reused_slug_follows_new_group(self):
+        url = reverse('posts:group_rss', args=(self.group.slug,))
+        self.client.get(url)
+        self.group.slug = 'old-classics'
+        self.group.save()
+        group = Group.objects.create(
+            title='Новые', slug='classics', description='')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.author, group=group, text='Новая')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Новая')
+
+    def test_reused_username_follows_new_author(self):
+        url = reverse('posts:profile_rss', args=(self.author.username,))
+        self.client.get(url)
+        self.author.username = 'old-author'
+        self.author.save()
+        author = User.objects.create_user(username='author')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=author, text='Дебют')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Дебют')
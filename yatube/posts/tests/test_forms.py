@@ -1,12 +1,19 @@
+import hashlib
 from http import HTTPStatus
+from io import BytesIO, StringIO
 
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.core.files.storage import FileSystemStorage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from PIL import Image
 
 from ..models import Group, Post, Comment
+from ..storage import hashed_name, is_hashed
 
 import shutil
 import tempfile
@@ -106,7 +113,8 @@ class PostFormTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, self.post_author)
         self.assertEqual(post.group_id, form_data['group'])
-        self.assertEqual(post.image, 'posts/small.gif')
+        self.assertEqual(post.image, hashed_name(
+            'posts/small.gif', hashlib.sha256(self.small_gif).hexdigest()))
 
     def test_authorized_user_edit_post(self):
         """Проверка редактирования записи авторизированным автором."""
@@ -269,3 +277,98 @@ class PostFormTests(TestCase):
         self.assertEqual(comment.post_id, post.id)
         self.assertRedirects(
             response, reverse('posts:post_detail', args={post.id}))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_SIDE=100,
+                   POST_IMAGE_MAX_PIXELS=50_000)
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, name, size, image_format, **save_options):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'green').save(
+            buffer, image_format, **save_options)
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'пост с картинкой',
+            'image': SimpleUploadedFile(name, buffer.getvalue()),
+        })
+
+    def test_large_jpeg_downscaled_without_exif(self):
+        """JPEG уменьшается при декодировании, EXIF вырезается."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        self.upload('photo.jpg', (1600, 800), 'JPEG', exif=exif.tobytes())
+        post = Post.objects.latest('id')
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+    def test_read_only_format_saved_as_png(self):
+        """Формат, который Pillow не умеет записывать, сохраняется в PNG."""
+        xpm = (b'/* XPM */\n'
+               b'static char *dot[] = {\n'
+               b'"2 2 2 1",\n'
+               b'"  c #FFFFFF",\n'
+               b'". c #000000",\n'
+               b'". ",\n'
+               b'" .",\n'
+               b'};\n')
+        response = self.client.post(reverse('posts:post_create'), {
+            'text': 'пост с картинкой',
+            'image': SimpleUploadedFile('dot.xpm', xpm),
+        })
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.latest('id')
+        self.assertTrue(post.image.name.endswith('.png'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual((image.format, image.size), ('PNG', (2, 2)))
+
+    def test_too_many_pixels_rejected(self):
+        """Картинка без draft-режима сверх предела пикселей отклоняется."""
+        response = self.upload('huge.png', (300, 300), 'PNG')
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
+        self.assertFormError(
+            response, 'form', 'image',
+            'Слишком большое изображение: 300×300.')
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_too_large_file_rejected(self):
+        self.upload('big.png', (50, 50), 'PNG')
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
+
+    def test_same_bytes_stored_once(self):
+        """Повторная загрузка тех же байтов переиспользует файл."""
+        self.upload('first.png', (20, 20), 'PNG')
+        self.upload('second.png', (20, 20), 'PNG')
+        first, second = Post.objects.filter(author=self.user)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed(first.image.name))
+
+    def test_rehash_renames_existing_images(self):
+        """rehash_post_images переводит старые имена на хэши."""
+        storage = Post._meta.get_field('image').storage
+        names = [FileSystemStorage().save(f'posts/old{i}.gif',
+                                          ContentFile(b'GIF89a same'))
+                 for i in range(2)]
+        posts = [Post.objects.create(text='старый', author=self.user,
+                                     image=name) for name in names]
+        call_command('rehash_post_images', batch_size=1, stdout=StringIO())
+        for post in posts:
+            post.refresh_from_db()
+            self.assertTrue(is_hashed(post.image.name))
+        self.assertEqual(posts[0].image.name, posts[1].image.name)
+        self.assertTrue(storage.exists(posts[0].image.name))
+        for name in names:
+            self.assertFalse(storage.exists(name))
@@ -0,0 +1,190 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import (Comment, Group, ImportedRecord, Post, PostTag,
+                      TimelineEntry, UserStats)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportContentTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='')
+        cls.reader.follower.create(author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        with open(os.path.join(self.directory, 'small.gif'), 'wb') as file:
+            file.write(SMALL_GIF)
+
+    def write_ndjson(self, name, records):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+    def run_import(self, *args, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_content', *args, stdout=out, stderr=err,
+                     image_root=self.directory, **options)
+        return out.getvalue(), err.getvalue()
+
+    def imported(self, model, source_id):
+        kind = 'posts' if model is Post else 'comments'
+        return model.objects.get(pk=ImportedRecord.objects.get(
+            kind=kind, source_id=source_id).object_id)
+
+    def test_posts_imported_with_derived_data(self):
+        path = self.write_ndjson('posts.ndjson', [
+            {'id': 500, 'author': 'author', 'group': 'group',
+             'text': '#кот @reader', 'pub_date': '2020-01-02T03:04:05Z',
+             'image': 'small.gif'},
+            {'id': 501, 'author': 'author', 'group': '', 'text': 'два',
+             'pub_date': '2020-01-03T00:00:00+00:00', 'image': ''},
+            {'id': 502, 'author': 'nobody', 'text': 'нет автора',
+             'pub_date': '2020-01-04T00:00:00Z'},
+        ])
+        out, err = self.run_import('posts', path, batch_size=2)
+        self.assertIn('создано: 2', out)
+        self.assertIn('Запись 3: ', err)
+        post = self.imported(Post, 500)
+        self.assertEqual(post.pub_date,
+                         datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+        self.assertEqual(post.group, self.group)
+        self.assertTrue(post.image.name.endswith('.gif'))
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertIn('#кот</a>', post.text_html)
+        self.assertTrue(PostTag.objects.filter(post=post).exists())
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                follower=self.reader).values_list('post_id', flat=True)),
+            {post.pk, self.imported(Post, 501).pk})
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 2)
+        # id базы идут после импортированных
+        self.assertGreater(
+            Post.objects.create(author=self.author, text='новый').pk,
+            self.imported(Post, 501).pk)
+
+    def test_resume_skips_done_records(self):
+        path = self.write_ndjson('posts.ndjson', [
+            {'id': 10 + i, 'author': 'author', 'text': f'пост {i}',
+             'pub_date': f'2020-01-0{i + 1}T00:00:00Z'}
+            for i in range(3)
+        ])
+        self.run_import('posts', path, batch_size=2)
+        with open(f'{path}.checkpoint') as file:
+            self.assertEqual(json.load(file), {'done': 3})
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({
+                'id': 20, 'author': 'author', 'text': 'новый',
+                'pub_date': '2020-02-01T00:00:00Z'}) + '\n')
+        out, _ = self.run_import('posts', path)
+        self.assertIn('Прочитано записей: 1, создано: 1', out)
+        # без места остановки уже вставленные записи пропускаются
+        out, _ = self.run_import('posts', path, restart=True)
+        self.assertIn('Прочитано записей: 4, создано: 0', out)
+        self.assertEqual(Post.objects.count(), 4)
+
+    def test_bad_records_reported_and_skipped(self):
+        """Битые строки и пустые поля попадают в ошибки, импорт идёт."""
+        good = {'id': 1, 'author': 'author', 'text': 'целый',
+                'pub_date': '2020-01-01T00:00:00Z'}
+        path = os.path.join(self.directory, 'posts.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            for line in ('{"id": 2, "text": ', 'null', '[1, 2]',
+                         json.dumps({**good, 'id': None}),
+                         json.dumps({**good, 'id': 3, 'text': None}),
+                         json.dumps({**good, 'id': 4, 'pub_date': None}),
+                         json.dumps({**good, 'id': 5, 'author': ['a']}),
+                         json.dumps(good)):
+                file.write(line + '\n')
+        out, err = self.run_import('posts', path, batch_size=3)
+        self.assertIn('Прочитано записей: 8, создано: 1, с ошибками: 7', out)
+        for number in range(1, 8):
+            self.assertIn(f'Запись {number}: ', err)
+        self.assertEqual(self.imported(Post, 1).text, 'целый')
+
+        path = self.write_ndjson('comments.ndjson', [
+            {'id': 1, 'post': None, 'author': 'reader', 'text': 'ничей',
+             'created': '2020-05-01T10:00:00Z'},
+            {'id': 2, 'post': 1, 'author': 'reader', 'text': 'к посту',
+             'created': '2020-05-01T11:00:00Z'},
+        ])
+        out, err = self.run_import('comments', path)
+        self.assertIn('создано: 1', out)
+        self.assertIn('Запись 1: ', err)
+        self.assertEqual(Comment.objects.get().text, 'к посту')
+
+    def test_comments_from_csv(self):
+        post = Post.objects.create(author=self.author, text='пост')
+        ImportedRecord.objects.create(
+            kind='posts', source_id=7, object_id=post.pk)
+        path = os.path.join(self.directory, 'comments.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(('id', 'post', 'author', 'text', 'created'))
+            writer.writerow((1, 7, 'reader', 'привет', '2020-05-01T10:00'))
+            writer.writerow((2, 8, 'reader', 'нет поста', '2020-05-01T11:00'))
+        out, err = self.run_import('comments', path)
+        self.assertIn('создано: 1', out)
+        self.assertIn('Запись 2: нет поста', err)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post, post)
+        self.assertEqual(comment.created.year, 2020)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).comments_count, 1)
+
+    def test_source_id_taken_by_local_post(self):
+        """id старой платформы, занятый здешним постом, не смешивает их."""
+        local = Post.objects.create(author=self.reader, text='здешний')
+        path = self.write_ndjson('posts.ndjson', [
+            {'id': local.pk, 'author': 'author', 'text': 'импортный',
+             'pub_date': '2020-01-02T00:00:00Z'},
+        ])
+        out, _ = self.run_import('posts', path)
+        self.assertIn('создано: 1', out)
+        post = self.imported(Post, local.pk)
+        self.assertNotEqual(post.pk, local.pk)
+        self.assertEqual(post.text, 'импортный')
+
+        path = self.write_ndjson('comments.ndjson', [
+            {'id': 1, 'post': local.pk, 'author': 'reader',
+             'text': 'к импортному', 'created': '2020-01-03T00:00:00Z'},
+        ])
+        out, _ = self.run_import('comments', path)
+        self.assertIn('создано: 1', out)
+        self.assertEqual(Comment.objects.get().post, post)
+        self.assertFalse(local.comments.exists())
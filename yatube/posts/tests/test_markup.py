@@ -0,0 +1,100 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import markup
+from ..models import Mention, Post, PostTag, Tag
+from ..views import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+class MarkupTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.friend = User.objects.create_user(username='friend.one')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tags_and_mentions_extracted(self):
+        self.assertEqual(
+            markup.tags('#Кот и #кот, C#, ##нет, &#39; #дом_2'),
+            {'кот', 'дом_2'})
+        self.assertEqual(
+            markup.mentions('@friend.one. и mail@example.com @x-'),
+            {'friend.one', 'x'})
+
+    def test_text_html_rendered_on_save(self):
+        """HTML строится при сохранении, текст экранирован."""
+        post = Post.objects.create(
+            author=self.author,
+            text='<b>#Кот</b> и @friend.one\nи @nobody')
+        tag_url = reverse('posts:tag_posts', args=('кот',))
+        profile_url = reverse('posts:profile', args=('friend.one',))
+        self.assertEqual(
+            post.text_html,
+            f'&lt;b&gt;<a href="{tag_url}">#Кот</a>&lt;/b&gt; и '
+            f'<a href="{profile_url}">@friend.one</a><br>и @nobody')
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,)))
+        self.assertContains(response, f'<a href="{tag_url}">#Кот</a>')
+
+    def test_index_follows_edits(self):
+        post = Post.objects.create(
+            author=self.author, text='#один #два @friend.one')
+        self.assertEqual(
+            set(PostTag.objects.filter(post=post).values_list(
+                'tag__name', flat=True)),
+            {'один', 'два'})
+        self.assertEqual(
+            list(Mention.objects.values_list('user', 'pub_date')),
+            [(self.friend.pk, post.pub_date)])
+        post.text = '#два #три'
+        post.save()
+        self.assertEqual(
+            set(PostTag.objects.filter(post=post).values_list(
+                'tag__name', flat=True)),
+            {'два', 'три'})
+        self.assertFalse(Mention.objects.exists())
+
+    def test_tag_page_lists_tagged_posts(self):
+        tagged = [Post.objects.create(author=self.author, text=f'#кот {i}')
+                  for i in range(POSTS_PER_PAGE + 2)]
+        Post.objects.create(author=self.author, text='без тега')
+        url = reverse('posts:tag_posts', args=('Кот',))
+        response = self.client.get(url)
+        self.assertEqual(response.context['tag'].name, 'кот')
+        self.assertEqual(
+            list(response.context['page_obj']),
+            tagged[::-1][:POSTS_PER_PAGE])
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual(list(response.context['page_obj']),
+                         tagged[1::-1])
+        self.assertEqual(self.client.get(
+            reverse('posts:tag_posts', args=('нет',))).status_code, 404)
+
+    def test_tag_page_expires_on_new_post(self):
+        url = reverse('posts:tag_posts', args=('кот',))
+        Post.objects.create(author=self.author, text='#кот первый')
+        self.assertNotContains(self.client.get(url), 'второй')
+        Post.objects.create(author=self.author, text='второй #кот')
+        self.assertContains(self.client.get(url), 'второй')
+
+    def test_reindex_command(self):
+        post = Post.objects.create(author=self.author, text='#кот')
+        Post.objects.filter(pk=post.pk).update(text='#пёс', text_html='')
+        out = StringIO()
+        call_command('reindex_post_markup', stdout=out)
+        self.assertIn('Обработано постов: 1', out.getvalue())
+        post.refresh_from_db()
+        self.assertIn('#пёс</a>', post.text_html)
+        self.assertEqual(
+            list(Tag.objects.filter(entries__post=post).values_list(
+                'name', flat=True)),
+            ['пёс'])
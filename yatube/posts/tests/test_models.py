@@ -1,4 +1,7 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
 from ..models import Group, Post, Comment, Follow
@@ -129,3 +132,11 @@ class CommentModelTest(TestCase):
             with self.subTest(value=value):
                 verbose_name = self.comment._meta.get_field(value).verbose_name
                 self.assertEqual(verbose_name, expected)
+
+
+class FeedIndexesTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент читают индексы без полного скана и сортировки."""
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        self.assertNotIn('TEMP B-TREE', out.getvalue())
@@ -0,0 +1,103 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import newest
+from ..models import Follow, Post
+from ..paginators import encode_cursor
+
+User = get_user_model()
+
+
+class NewPostsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        # TestCase не коммитит, отметки ставим сразу.
+        patcher = mock.patch.object(
+            newest.transaction, 'on_commit', lambda func: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.post = Post.objects.create(author=self.author, text='первый')
+
+    def poll(self, feed, since, **headers):
+        return self.client.get(
+            reverse('posts:new_posts', args=(feed,)), {'since': since},
+            **headers)
+
+    def test_idle_poll_skips_database(self):
+        cursor = self.client.get(
+            reverse('posts:index')).context['live_cursor']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.poll('index', cursor)
+            self.assertEqual(response.json()['count'], 0)
+            response = self.poll(
+                'index', cursor, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(len(queries), 0)
+
+    def test_new_posts_counted_and_fetched(self):
+        cursor = self.client.get(
+            reverse('posts:index')).context['live_cursor']
+        etag = self.poll('index', cursor)['ETag']
+        second = Post.objects.create(author=self.author, text='второй')
+        third = Post.objects.create(author=self.author, text='третий')
+        response = self.poll('index', cursor, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['count'], 2)
+        response = self.client.get(
+            reverse('posts:new_post_cards', args=('index',)),
+            {'since': cursor})
+        self.assertEqual(list(response.context['page_obj']), [third, second])
+        self.assertNotContains(response, 'первый')
+        cursor = response.context['cursor']
+        self.assertEqual(self.poll('index', cursor).json()['count'], 0)
+
+    def test_follow_feed(self):
+        self.client.force_login(self.reader)
+        cursor = self.client.get(
+            reverse('posts:follow_index')).context['live_cursor']
+        self.assertEqual(self.poll('follow', cursor).json()['count'], 0)
+        Post.objects.create(author=self.reader, text='свой пост')
+        self.assertEqual(self.poll('follow', cursor).json()['count'], 0)
+        Post.objects.create(author=self.author, text='от автора')
+        self.assertEqual(self.poll('follow', cursor).json()['count'], 1)
+
+    def test_lost_mark_restored_from_database(self):
+        cursor = self.client.get(
+            reverse('posts:index')).context['live_cursor']
+        Post.objects.create(author=self.author, text='второй')
+        cache.clear()
+        self.assertEqual(self.poll('index', cursor).json()['count'], 1)
+        self.assertIsNotNone(newest.get('index'))
+
+    def test_index_cursor_from_mark(self):
+        """Курсор главной совпадает с курсором по самому посту."""
+        self.assertIsNotNone(newest.get('index'))
+        self.assertEqual(
+            self.client.get(reverse('posts:index')).context['live_cursor'],
+            encode_cursor(self.post))
+
+    def test_errors(self):
+        self.assertEqual(self.poll('follow', '').status_code,
+                         HTTPStatus.FORBIDDEN)
+        self.assertEqual(self.poll('nothing', '').status_code,
+                         HTTPStatus.NOT_FOUND)
+
+    def test_only_first_page_polls(self):
+        Post.objects.create(author=self.author, text='второй')
+        cursor = self.client.get(
+            reverse('posts:index')).context['live_cursor']
+        response = self.client.get(reverse('posts:index'), {'after': cursor})
+        self.assertIsNone(response.context['live_cursor'])
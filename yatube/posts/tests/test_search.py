@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.cat = Post.objects.create(
+            author=cls.user, text='Кот сидит на окне и смотрит на кота')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Коты и <script>кошки</script>')
+        cls.dog = Post.objects.create(
+            author=cls.user, text='Собака лает')
+
+    def results(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params})
+        return response, list(response.context['page_obj'])
+
+    def test_ranked_prefix_matches(self):
+        """Слова ищутся по префиксу, чаще упомянутые выше."""
+        _, posts = self.results('кот')
+        self.assertEqual(posts, [self.cat, self.cats])
+        _, posts = self.results('собака лает')
+        self.assertEqual(posts, [self.dog])
+        _, posts = self.results('"*)(')
+        self.assertEqual(posts, [])
+
+    def test_snippet_highlighted_and_escaped(self):
+        response, _ = self.results('кошки')
+        self.assertContains(
+            response, '&lt;script&gt;<mark>кошки</mark>&lt;/script&gt;')
+        self.assertNotContains(response, '<script>кошки')
+
+    def test_index_follows_changes(self):
+        """Триггеры обновляют индекс при правке и удалении."""
+        Post.objects.filter(pk=self.dog.pk).update(text='Кот мяукает')
+        _, posts = self.results('мяукает')
+        self.assertEqual(posts, [self.dog])
+        self.assertEqual(self.results('собака')[1], [])
+        Post.objects.filter(pk=self.dog.pk).delete()
+        self.assertEqual(self.results('мяукает')[1], [])
+
+    def test_cursor_pagination(self):
+        for number in range(5):
+            Post.objects.create(author=self.user, text=f'кот номер {number}')
+        seen = []
+        page = search.search('кот', per_page=3)
+        while True:
+            seen.extend(page)
+            if not page.has_next():
+                break
+            response, posts = self.results('кот', after=page.next_cursor)
+            self.assertContains(response, 'Первая')
+            page = response.context['page_obj']
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(
+            set(seen),
+            set(Post.objects.filter(text__icontains='кот')) | {self.cats})
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {search.TABLE} ({search.TABLE}) "
+                f"VALUES ('delete-all')")
+        self.assertEqual(self.results('собака')[1], [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Проиндексировано постов: 3', out.getvalue())
+        self.assertEqual(self.results('собака')[1], [self.dog])
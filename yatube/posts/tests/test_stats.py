@@ -0,0 +1,46 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Post, UserStats
+from ..stats import get_stats
+
+User = get_user_model()
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def counters(self, user):
+        stats = UserStats.objects.get(user=user)
+        return (stats.posts_count, stats.comments_count,
+                stats.followers_count, stats.followings_count)
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(text='пост', author=self.author)
+        Comment.objects.create(post=post, author=self.author, text='комм')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(self.author), (1, 1, 1, 0))
+        self.assertEqual(self.counters(self.reader), (0, 0, 0, 1))
+
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.counters(self.author), (0, 0, 0, 0))
+        self.assertEqual(self.counters(self.reader), (0, 0, 0, 0))
+
+    def test_reconcile_user_stats_fixes_drift(self):
+        """reconcile_user_stats исправляет расхождения со счётом строк."""
+        self.assertEqual(get_stats(self.author.pk).posts_count, 0)
+        # bulk_create не шлёт сигналы, счётчик отстаёт
+        Post.objects.bulk_create(
+            [Post(text='пост', author=self.author) for _ in range(3)])
+        self.assertEqual(get_stats(self.author.pk).posts_count, 0)
+        call_command('reconcile_user_stats', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.counters(self.author), (3, 0, 0, 0))
@@ -0,0 +1,236 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from .. import signals, thumbnails, variants
+from ..models import ImageVariant, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+# Без фонового потока: он писал бы во временный MEDIA_ROOT после теста.
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, name='small.gif'):
+        return Post.objects.create(
+            text='пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        )
+
+    def test_new_image_is_queued_after_commit(self):
+        """Сохранение новой картинки ставит миниатюры в очередь."""
+        with mock.patch.object(signals.transaction, 'on_commit',
+                               lambda func: func()), \
+                mock.patch.object(thumbnails, 'enqueue') as enqueue:
+            post = self.create_post()
+            enqueue.assert_called_once()
+            post_id, name, feeds = enqueue.call_args[0]
+            self.assertEqual((post_id, name), (post.pk, post.image.name))
+            self.assertIn(f'post:{post.pk}', feeds)
+
+            enqueue.reset_mock()
+            post.text = 'новый текст'
+            post.save()
+            enqueue.assert_not_called()
+
+    def test_page_falls_back_to_original_until_generated(self):
+        """Страница не строит миниатюру сама и до готовности даёт оригинал."""
+        post = self.create_post()
+        self.client.force_login(self.user)
+        url = reverse('posts:post_detail', args=(post.pk,))
+        response = self.client.get(url)
+        self.assertContains(response, post.image.url)
+        self.assertIsNone(thumbnails.cached(post.image, 'card'))
+
+        thumbnails.generate(post.image.name)
+        response = self.client.get(url)
+        thumbnail = thumbnails.cached(post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        self.assertContains(response, thumbnail.url)
+        self.assertContains(response, 'width="960"')
+
+    def test_variants_recorded_and_rendered_as_picture(self):
+        """Варианты строятся один раз и выводятся в <picture> с srcset."""
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 600), 'blue').save(buffer, 'PNG')
+        post = Post.objects.create(
+            text='большая картинка',
+            author=self.user,
+            image=SimpleUploadedFile('big.png', buffer.getvalue()),
+        )
+        variants.generate(post.pk, post.image.name)
+        formats = variants.supported_formats(('avif', 'webp', 'jpeg'))
+        self.assertEqual(
+            set(ImageVariant.objects.filter(post=post).values_list(
+                'format', 'width', 'height')),
+            {(fmt, width, height) for fmt in formats
+             for width, height in ((480, 170), (960, 339))},
+        )
+
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,)))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '-card-480.jpg 480w')
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_feed_page_resolves_thumbnails_at_once(self):
+        """Миниатюры всей страницы ищутся одним запросом к KVStore."""
+        posts = [self.create_post(f'small{i}.gif') for i in range(4)]
+        for post in posts[:2]:
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        kvstore_queries = [query for query in queries
+                           if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(kvstore_queries), 1)
+        for post in posts[:2]:
+            self.assertContains(
+                response, thumbnails.cached(post.image, 'card').url)
+        for post in posts[2:]:
+            self.assertContains(response, post.image.url)
+
+
+@override_settings(THUMBNAIL_WORKERS=1)
+class ThumbnailQueueTest(SimpleTestCase):
+    def tearDown(self):
+        if thumbnails._executor is not None:
+            thumbnails._executor.shutdown(wait=True)
+            thumbnails._executor = None
+
+    def test_waiting_posts_with_same_file_all_processed(self):
+        """Пост с тем же файлом, пока задача идёт, тоже получает варианты."""
+        started, release = threading.Event(), threading.Event()
+
+        def generate(name):
+            started.set()
+            release.wait(5)
+
+        with mock.patch.object(thumbnails, 'generate', generate), \
+                mock.patch.object(variants, 'generate') as make_variants, \
+                mock.patch.object(thumbnails.fragments, 'bump') as bump:
+            thumbnails.enqueue(1, 'posts/same.gif', ('post:1',))
+            self.assertTrue(started.wait(5))
+            thumbnails.enqueue(2, 'posts/same.gif', ('post:2',))
+            release.set()
+            thumbnails._executor.shutdown(wait=True)
+
+        self.assertEqual(
+            [call[0] for call in make_variants.call_args_list],
+            [(1, 'posts/same.gif'), (2, 'posts/same.gif')])
+        self.assertEqual(
+            [call[0] for call in bump.call_args_list],
+            [('post:1',), ('post:2',)])
+        self.assertEqual(thumbnails._pending, {})
+
+
+GC_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=GC_MEDIA_ROOT,
+                   MEDIA_GC_CHECKPOINT=os.path.join(GC_MEDIA_ROOT, 'gc.json'))
+class CollectMediaGarbageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='collector')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(GC_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, color):
+        buffer = BytesIO()
+        Image.new('RGB', (500, 200), color).save(buffer, 'PNG')
+        post = Post.objects.create(
+            text='пост', author=self.user,
+            image=SimpleUploadedFile('image.png', buffer.getvalue()))
+        thumbnails.generate(post.image.name)
+        variants.generate(post.pk, post.image.name)
+        return post
+
+    def media_files(self):
+        return {
+            os.path.relpath(os.path.join(directory, name), GC_MEDIA_ROOT)
+            for directory, _, names in os.walk(GC_MEDIA_ROOT)
+            for name in names if name != 'gc.json'
+        }
+
+    def collect(self, **options):
+        out = StringIO()
+        call_command('collect_media_garbage', min_age=0,
+                     tmp_root=self.tmp_root, stdout=out, **options)
+        return out.getvalue()
+
+    def test_orphans_removed_in_batches_with_checkpoint(self):
+        """Сиротские файлы удаляются пачками, обход продолжается."""
+        live = self.create_post('red')
+        before = self.media_files()
+        orphan = self.create_post('green')
+        orphan_files = self.media_files() - before
+        orphan.delete()
+        self.tmp_root = tempfile.mkdtemp(dir=GC_MEDIA_ROOT)
+        os.mkdir(os.path.join(self.tmp_root, 'tmpabcd1234'))
+        os.mkdir(os.path.join(self.tmp_root, 'keep'))
+        reclaimable = sum(
+            os.path.getsize(os.path.join(GC_MEDIA_ROOT, name))
+            for name in orphan_files)
+
+        output = self.collect(dry_run=True)
+        self.assertIn(f'Можно освободить: {reclaimable} байт', output)
+        self.assertEqual(self.media_files() - before, orphan_files)
+
+        output = self.collect(batch_size=1, max_batches=1)
+        self.assertIn('следующий запуск продолжит', output)
+        self.assertEqual(len(self.media_files() - before),
+                         len(orphan_files) - 1)
+        self.assertEqual(os.listdir(self.tmp_root), ['keep'])
+
+        output = self.collect(batch_size=2)
+        self.assertIn('Обход завершён', output)
+        self.assertEqual(self.media_files(), before)
+        self.assertIsNotNone(thumbnails.cached(live.image, 'card'))
+        self.assertIsNone(thumbnails.cached(orphan.image, 'card'))
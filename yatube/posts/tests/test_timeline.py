@@ -0,0 +1,129 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(text='старый пост',
+                                           author=cls.author)
+
+    def timeline_ids(self):
+        return list(TimelineEntry.objects.filter(
+            follower=self.reader).values_list('post_id', flat=True))
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет в ленту старые посты, отписка их убирает."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.timeline_ids(), [self.old_post.pk])
+        follow.delete()
+        self.assertEqual(self.timeline_ids(), [])
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост автора попадает в ленту подписчика первым."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='новый пост', author=self.author)
+        self.assertEqual(self.timeline_ids(), [post.pk, self.old_post.pk])
+
+    def test_followed_author_can_be_deleted(self):
+        """Удаление автора с подписчиками не падает на его статистике."""
+        author = User.objects.create_user(username='leaving')
+        Follow.objects.create(user=self.reader, author=author)
+        Post.objects.create(text='пост', author=author)
+        author.delete()
+        self.assertFalse(User.objects.filter(username='leaving').exists())
+        self.assertEqual(self.timeline_ids(), [])
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline_ids(), [self.old_post.pk])
+
+
+class HybridTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.author, author=cls.celebrity)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    @override_settings(TIMELINE_PUSH_THRESHOLD=1)
+    def test_pulled_author_is_merged_on_read(self):
+        """Посты автора выше порога не раскладываются, но видны в ленте."""
+        Follow.objects.create(user=self.reader, author=self.celebrity)
+        posts = [
+            Post.objects.create(text='пост', author=author)
+            for author in (self.celebrity, self.author, self.celebrity)
+        ]
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author=self.celebrity).exists())
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in reversed(posts)])
+        response = self.client.get(reverse('posts:follow_index'),
+                                   {'after': ''})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in reversed(posts)])
+
+    @override_settings(TIMELINE_PUSH_THRESHOLD=1, TIMELINE_WORKERS=0,
+                       TIMELINE_BACKFILL_POSTS=2)
+    def test_author_back_under_threshold_is_pushed(self):
+        """После отписки до порога последние посты автора раскладываются."""
+        Follow.objects.create(user=self.reader, author=self.celebrity)
+        posts = [Post.objects.create(text='пост', author=self.celebrity)
+                 for _ in range(3)]
+        with mock.patch.object(timeline.transaction, 'on_commit') as commit:
+            Follow.objects.filter(
+                user=self.author, author=self.celebrity).delete()
+        # в самом запросе отписки ничего не раскладывается
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author=self.celebrity).exists())
+        commit.assert_called_once()
+        commit.call_args[0][0]()
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [posts[2], posts[1]])
+
+    @override_settings(TIMELINE_PUSH_THRESHOLD=1)
+    def test_pulled_posts_with_same_date_ordered_by_id(self):
+        Follow.objects.create(user=self.reader, author=self.celebrity)
+        posts = [Post.objects.create(text='пост', author=self.celebrity)
+                 for _ in range(2)]
+        Post.objects.filter(pk=posts[1].pk).update(
+            pub_date=posts[0].pub_date)
+        feed = timeline.follow_feed(self.reader.pk)
+        self.assertEqual([row.post_id for row in feed],
+                         [posts[1].pk, posts[0].pk])
+
+    def test_benchmark_timeline_command(self):
+        """Команда benchmark_timeline отрабатывает и ничего не оставляет."""
+        users = User.objects.count()
+        call_command('benchmark_timeline', followers=3, pulled_authors=2,
+                     posts=2, repeat=1, stdout=StringIO())
+        self.assertEqual(User.objects.count(), users)
@@ -1,4 +1,5 @@
 import tempfile
+from http import HTTPStatus
 
 from django import forms
 from django.contrib.auth import get_user_model
@@ -8,8 +9,10 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 from django.urls import reverse
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post, Follow
+from ..models import Comment, Group, Post, Follow
 from ..const import NUM_POST, NUM_PAG
 
 User = get_user_model()
@@ -229,7 +232,14 @@ class PostPagesTests(TestCase):
                     self.check_post(response.context['post'])
 
     def test_cache(self):
-        posts_count = Post.objects.count()
+        """Фрагмент главной хранится в кэше до изменения постов."""
+        response = self.authorized_client.get(self.page_index)
+        response_content_cached = response.content
+
+        Post.objects.filter(pk=self.post.pk).update(text='без сигнала')
+        response = self.authorized_client.get(self.page_index)
+        self.assertEqual(response_content_cached, response.content)
+
         post = Post.objects.create(
             text='test text',
             author=self.user,
@@ -237,17 +247,46 @@ class PostPagesTests(TestCase):
             image=self.uploaded
         )
         response = self.authorized_client.get(self.page_index)
-        response_posts_count = len(response.context['page_obj'])
-        response_content_cached = response.content
-        self.assertEqual(response_posts_count, posts_count + 1)
+        self.assertContains(response, post.text)
 
         post.delete()
         response = self.authorized_client.get(self.page_index)
-        self.assertEqual(response_content_cached, response.content)
-
-        cache.clear()
+        self.assertNotContains(response, post.text)
+
+    def test_warm_index_fragment_skips_page_queries(self):
+        """При тёплом фрагменте главная не загружает посты страницы."""
+        self.authorized_client.get(self.page_index)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(self.page_index)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('posts_imagevariant', sql)
+        self.assertNotIn('"posts_post"."text"', sql)
+        self.assertIsNotNone(response.context['live_cursor'])
+
+    def test_group_and_profile_fragments_expire_on_new_post(self):
+        """Новый пост сразу виден в кэшированных ленте группы и профиле."""
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        post = Post.objects.create(
+            text='свежий пост', author=self.user, group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, post.text)
+
+    def test_group_title_change_expires_fragments(self):
+        """Переименование группы видно в кэшированной главной."""
+        self.authorized_client.get(self.page_index)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
         response = self.authorized_client.get(self.page_index)
-        self.assertNotEqual(response_content_cached, response.content)
+        self.assertContains(response, 'Новое название')
 
 
 class PaginatorViewsTest(TestCase):
@@ -276,6 +315,227 @@ class PaginatorViewsTest(TestCase):
             len(response.context.get('page_obj').object_list), NUM_PAG)
 
 
+@override_settings(POSTS_PAGINATION='cursor')
+class CursorPaginatorViewsTest(TestCase):
+    """Тестируем курсорную пагинацию по (pub_date, id)."""
+    POSTS_COUNT = 13
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='CursorUser')
+        Post.objects.bulk_create([Post(
+            text=f'Тестовое сообщение{i}',
+            author=cls.user)
+            for i in range(cls.POSTS_COUNT)])
+        cls.expected_ids = list(
+            Post.objects.order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_cover_feed_in_order(self):
+        """Следующие страницы по ?after= проходят ленту без пропусков."""
+        response = self.client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), NUM_POST)
+        self.assertTrue(page_obj.has_next())
+        self.assertFalse(page_obj.has_previous())
+        seen = [post.pk for post in page_obj]
+
+        response = self.client.get(
+            reverse('posts:index'), {'after': page_obj.next_cursor})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), NUM_PAG)
+        self.assertFalse(page_obj.has_next())
+        self.assertTrue(page_obj.has_previous())
+        seen += [post.pk for post in page_obj]
+        self.assertEqual(seen, self.expected_ids)
+
+        response = self.client.get(
+            reverse('posts:index'), {'before': page_obj.previous_cursor})
+        first_page = [post.pk for post in response.context['page_obj']]
+        self.assertEqual(first_page, self.expected_ids[:NUM_POST])
+
+    def test_cursor_page_does_not_count(self):
+        """Курсорная страница не выполняет COUNT(*)."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        for query in queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    @override_settings(POSTS_PAGINATION='page')
+    def test_numbered_pages_still_available(self):
+        """Нумерованные страницы работают, пока в запросе нет курсора."""
+        response = self.client.get(reverse('posts:index') + '?page=2')
+        self.assertEqual(response.context['page_obj'].number, 2)
+        response = self.client.get(reverse('posts:index') + '?after=')
+        self.assertTrue(response.context['page_obj'].is_cursor)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый токен приводит к первой странице."""
+        response = self.client.get(reverse('posts:index'), {'after': '%%'})
+        first_page = [post.pk for post in response.context['page_obj']]
+        self.assertEqual(first_page, self.expected_ids[:NUM_POST])
+
+
+class CommentPaginationTest(TestCase):
+    """Комментарии поста выводятся порциями по курсору (created, id)."""
+    COMMENTS_COUNT = 25
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Commentator')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        Comment.objects.bulk_create([Comment(
+            post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(cls.COMMENTS_COUNT)])
+        cls.expected_ids = list(
+            cls.post.comments.order_by('-created', '-pk')
+            .values_list('pk', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_comments_loaded_in_batches(self):
+        """Кнопка "Показать ещё" отдаёт следующую порцию без повторов."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)))
+        comments = response.context['comments']
+        self.assertTrue(comments.has_next())
+        seen = [comment.pk for comment in comments]
+
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'after': comments.next_cursor})
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        comments = response.context['comments']
+        self.assertFalse(comments.has_next())
+        seen += [comment.pk for comment in comments]
+        self.assertEqual(seen, self.expected_ids)
+
+    def test_comment_authors_in_same_query(self):
+        """Число запросов не зависит от числа комментариев."""
+        url = reverse('posts:post_comments', args=(self.post.pk,))
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, self.user.username)
+
+    def test_missing_post_returns_404(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk + 1,)))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class FeedQueryCountTest(TestCase):
+    """Число запросов на страницу ленты не зависит от числа постов."""
+    # сессия, пользователь, COUNT(*) пагинатора, посты страницы
+    # и варианты их картинок
+    BASE_QUERIES = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='feed-group', description='описание')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}',
+                                     first_name='Имя', last_name=str(i))
+            for i in range(NUM_POST)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+            Post.objects.create(text='текст', author=author, group=cls.group)
+        cls.max_queries = {
+            reverse('posts:index'): cls.BASE_QUERIES,
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}):
+                cls.BASE_QUERIES + 1,
+            # автор, подписка и UserStats вместо COUNT(*) пагинатора
+            reverse('posts:profile',
+                    kwargs={'username': cls.authors[0].username}):
+                cls.BASE_QUERIES + 2,
+            # авторы выше порога, страница id из ленты, затем сами посты
+            reverse('posts:follow_index'): cls.BASE_QUERIES + 2,
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_pages_query_count(self):
+        """Карточки ленты не делают дополнительных запросов."""
+        for url, max_queries in self.max_queries.items():
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(url)
+                self.assertLessEqual(
+                    len(queries), max_queries,
+                    '\n'.join(query['sql'] for query in queries))
+
+
+class AnonymousPageCacheTest(TestCase):
+    """Кэш страниц для анонимов с ETag / Last-Modified."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='page_author')
+        cls.post = Post.objects.create(text='первый пост', author=cls.user)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': cls.user}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified_without_render(self):
+        """Повторный запрос с валидаторами получает 304 без рендеринга."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertIsNone(response.context)
+
+    def test_cached_body_and_invalidation(self):
+        """Тело берётся из кэша, пока сигналы не сменят версию ленты."""
+        first = self.client.get(self.urls[0])
+        second = self.client.get(self.urls[0])
+        self.assertIsNone(second.context)
+        self.assertEqual(first.content, second.content)
+
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='новый комментарий')
+        response = self.client.get(
+            self.urls[2], HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertContains(response, 'новый комментарий')
+
+        Post.objects.create(text='второй пост', author=self.user)
+        response = self.client.get(
+            self.urls[0], HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'второй пост')
+
+    def test_authenticated_user_is_not_cached(self):
+        """Авторизованный пользователь всегда получает свежую страницу."""
+        self.client.force_login(self.user)
+        response = self.client.get(self.urls[0])
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIsNotNone(response.context)
+
+
 class TestFollowViews(TestCase):
     @classmethod
     def setUpClass(cls):
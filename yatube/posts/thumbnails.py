@@ -0,0 +1,200 @@
+"""Миниатюры картинок постов, подготовленные заранее.
+
+После сохранения поста с новой картинкой миниатюры всех размеров из
+settings.POST_THUMBNAILS и варианты для srcset (posts/variants.py)
+строятся в фоновом потоке. Шаблоны только спрашивают хранилище
+sorl-thumbnail, готова ли миниатюра, и до тех пор показывают оригинал.
+Когда всё готово, версии лент сбрасываются, чтобы закэшированные
+страницы получили новые ссылки.
+Старые посты дообрабатывает команда pregenerate_thumbnails.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore
+
+from . import fragments, variants
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+# имя файла -> [(id поста, ленты)], ждущие построения миниатюр
+_pending = {}
+_lock = threading.Lock()
+
+
+def source_file(image):
+    """Картинка поста для sorl по полю или по имени файла.
+
+    Ключ миниатюры зависит от хранилища картинки, поэтому имя
+    оборачивается с хранилищем поля Post.image, а не default_storage.
+    """
+    if isinstance(image, str):
+        return ImageFile(image, Post._meta.get_field('image').storage)
+    return ImageFile(image)
+
+
+def thumbnail_file(image, preset):
+    """Файл миниатюры пресета; сама миниатюра может ещё не существовать.
+
+    Опции дополняются так же, как в ThumbnailBackend.get_thumbnail,
+    иначе имя файла не совпадёт с тем, что построит sorl.
+    """
+    geometry, options = settings.POST_THUMBNAILS[preset]
+    backend = default.backend
+    source = source_file(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def cached(image, preset):
+    """Готовая миниатюра или None. Никогда не строит её сама."""
+    if not image:
+        return None
+    return default.kvstore.get(thumbnail_file(image, preset))
+
+
+def _has_variants(post, preset):
+    return any(variant.preset == preset
+               for variant in post.image_variants.all())
+
+
+def resolve(posts, preset):
+    """Готовые миниатюры для постов страницы: {post.pk: ImageFile}.
+
+    Вместо запроса к хранилищу sorl на каждую картинку ключи всех
+    миниатюр читаются одним get_many из кэша, а промахи - одним
+    запросом к таблице KVStore. Посты с вариантами для srcset
+    пропускаются: миниатюра им не понадобится.
+    """
+    wanted = [post for post in posts
+              if post.image and not _has_variants(post, preset)]
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBStore):
+        found = {post.pk: cached(post.image, preset) for post in wanted}
+        return {pk: image for pk, image in found.items() if image}
+    keys = {
+        add_prefix(thumbnail_file(post.image, preset).key): post.pk
+        for post in wanted
+    }
+    if not keys:
+        return {}
+    found = kvstore.cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        rows = dict(KVStore.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        found.update(rows)
+        # Как и sorl, запоминаем отсутствие, чтобы не ходить в базу.
+        kvstore.cache.set_many(
+            {key: rows.get(key, EMPTY_VALUE) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+    return {
+        keys[key]: deserialize_image_file(value)
+        for key, value in found.items()
+        if value and value != EMPTY_VALUE
+    }
+
+
+class PageThumbnails:
+    """Миниатюры постов страницы, найденные при первом обращении.
+
+    Пока страница берётся из кэша фрагментов, поиск не выполняется.
+    """
+
+    def __init__(self, posts, preset='card'):
+        self.posts = posts
+        self.preset = preset
+        self._found = None
+
+    def get(self, post):
+        if self._found is None:
+            self._found = resolve(self.posts, self.preset)
+        return self._found.get(post.pk)
+
+
+def generate(image):
+    """Строит миниатюры всех пресетов для картинки."""
+    source = source_file(image)
+    for geometry, options in settings.POST_THUMBNAILS.values():
+        get_thumbnail(source, geometry, **options)
+
+
+def _run(name):
+    """Строит миниатюры файла, затем обрабатывает все ждущие его посты.
+
+    Пока задача идёт, тот же файл (одинаковые байты получают одно имя)
+    могут загрузить ещё посты: они встают в _pending[name], и задача
+    строит варианты и сбрасывает ленты для каждого из них.
+    """
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры для %s', name)
+        with _lock:
+            del _pending[name]
+        close_old_connections()
+        return
+    try:
+        while True:
+            with _lock:
+                waiting = _pending[name]
+                if not waiting:
+                    del _pending[name]
+                    return
+                _pending[name] = []
+            for post_id, feeds in waiting:
+                try:
+                    variants.generate(post_id, name)
+                    fragments.bump(*feeds)
+                except Exception:
+                    logger.exception(
+                        'Не удалось построить варианты для поста %s',
+                        post_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue(post_id, name, feeds=()):
+    """Ставит картинку поста в очередь фонового построения миниатюр.
+
+    feeds - ленты (posts/fragments.py), которые нужно сбросить,
+    когда миниатюры будут готовы.
+    """
+    global _executor
+    if not name:
+        return
+    with _lock:
+        queued = name in _pending
+        _pending.setdefault(name, []).append((post_id, tuple(feeds)))
+        if queued:
+            return
+        if settings.THUMBNAIL_WORKERS and _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    if not settings.THUMBNAIL_WORKERS:
+        _run(name)
+        return
+    _executor.submit(_run, name)
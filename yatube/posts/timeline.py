@@ -0,0 +1,190 @@
+"""Лента подписок, собранная при записи (fan-out on write).
+
+Каждый новый пост раскладывается в TimelineEntry всем подписчикам
+автора, поэтому follow_index читает готовый упорядоченный список
+id постов, а не соединяет Follow и Post на каждый запрос.
+
+Авторы, у которых подписчиков больше settings.TIMELINE_PUSH_THRESHOLD,
+не раскладываются: их свежие посты подмешиваются при чтении
+(гибрид push/pull), чтобы один пост не превращался в десятки тысяч
+вставок. Когда после отписки автор опускается до порога, его последние
+settings.TIMELINE_BACKFILL_POSTS постов раскладываются подписчикам
+в фоновом потоке, а не в запросе отписки.
+"""
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from . import newest, stats
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginators import MergedFeed
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _insert(entries):
+    """Вставляет записи ленты пачками, не собирая их все в память."""
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_pulled(author_id):
+    """Посты автора не раскладываются, а читаются при открытии ленты."""
+    followers = stats.get_stats(author_id).followers_count
+    return followers > settings.TIMELINE_PUSH_THRESHOLD
+
+
+def pulled_authors(follower_id):
+    """id авторов подписчика, чьи посты нужно подмешать при чтении."""
+    followed = Follow.objects.filter(
+        user_id=follower_id).values('author_id')
+    return list(
+        UserStats.objects.filter(
+            user_id__in=followed,
+            followers_count__gt=settings.TIMELINE_PUSH_THRESHOLD,
+        ).values_list('user_id', flat=True)
+    )
+
+
+def follow_feed(follower_id):
+    """Лента подписок: разложенные записи плюс посты "тяжёлых" авторов.
+
+    Каждая строка - (pub_date, post_id), ленту нужно пагинировать
+    с key='post_id'.
+    """
+    sources = [
+        TimelineEntry.objects.filter(follower_id=follower_id)
+        .order_by('-pub_date', '-post_id')
+        .values_list('pub_date', 'post_id', named=True)
+    ]
+    for author_id in pulled_authors(follower_id):
+        sources.append(
+            Post.objects.filter(author_id=author_id)
+            .order_by('-pub_date', '-id')
+            .annotate(post_id=F('pk'))
+            .values_list('pub_date', 'post_id', named=True)
+        )
+    return MergedFeed(sources)
+
+
+def push_post(post):
+    """Раскладывает пост по лентам подписчиков автора."""
+    push_posts([post])
+
+
+def push_posts(posts):
+    """Раскладывает пачку постов, читая подписчиков автора один раз."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    for author_id, author_posts in by_author.items():
+        if is_pulled(author_id):
+            continue
+        follower_ids = list(Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True))
+        _insert(
+            TimelineEntry(follower_id=follower_id, post_id=post.pk,
+                          pub_date=post.pub_date)
+            for post in author_posts for follower_id in follower_ids
+        )
+        newest.advance(
+            [f'follow:{follower_id}' for follower_id in follower_ids],
+            max(author_posts, key=newest.key_of))
+
+
+def backfill(follower_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')
+    _insert(
+        TimelineEntry(follower_id=follower_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def prune(follower_id, author_id):
+    """Убирает из ленты подписчика посты автора.
+
+    Если после отписки автор опустился до порога, его посты, которые
+    подмешивались при чтении, раскладываются оставшимся подписчикам.
+    """
+    TimelineEntry.objects.filter(
+        follower_id=follower_id, post__author_id=author_id).delete()
+    # Без get_stats: при удалении автора каскад уже убрал его
+    # статистику, и создавать её заново нельзя.
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    if followers == settings.TIMELINE_PUSH_THRESHOLD:
+        transaction.on_commit(lambda: _enqueue(author_id))
+
+
+def _run(author_id):
+    try:
+        backfill_followers(author_id)
+    except Exception:
+        logger.exception('Не удалось разложить посты автора %s', author_id)
+    finally:
+        close_old_connections()
+
+
+def _enqueue(author_id):
+    global _executor
+    if not settings.TIMELINE_WORKERS:
+        _run(author_id)
+        return
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TIMELINE_WORKERS,
+                thread_name_prefix='timeline',
+            )
+    _executor.submit(_run, author_id)
+
+
+def backfill_followers(author_id):
+    """Раскладывает последние посты автора всем его подписчикам.
+
+    Более старые посты остаются в профиле автора, целиком ленты
+    восстанавливает rebuild_timelines.
+    """
+    follower_ids = list(Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True))
+    posts = list(
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL_POSTS]
+    )
+    _insert(
+        TimelineEntry(follower_id=follower_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts
+        for follower_id in follower_ids
+    )
+
+
+def rebuild():
+    """Пересобирает все ленты с нуля, возвращает число подписок."""
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    count = 0
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        for follower_id, author_id in follows.iterator():
+            backfill(follower_id, author_id)
+            count += 1
+    return count
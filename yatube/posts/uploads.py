@@ -0,0 +1,94 @@
+"""Проверка и уменьшение загружаемых картинок постов.
+
+Картинка не декодируется целиком, пока не пройдены проверки:
+размер файла сверяется с POST_IMAGE_MAX_UPLOAD_SIZE, заголовок
+читается без пикселей. JPEG затем декодируется сразу в уменьшенном
+масштабе (draft), и только такое число пикселей сверяется
+с POST_IMAGE_MAX_PIXELS. Картинка ужимается до POST_IMAGE_MAX_SIDE
+по большей стороне и пересохраняется без EXIF и прочих метаданных.
+Форматы, которые Pillow умеет только читать (XPM, PSD и т. п.),
+пересохраняются в PNG.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+# метаданные, которые нужны для правильного вывода картинки
+KEEP_INFO = ('transparency',)
+QUALITY = 90
+# во что пересохранять форматы, которые Pillow не умеет записывать
+FALLBACK_FORMAT = 'PNG'
+FALLBACK_MODES = ('1', 'L', 'LA', 'I', 'P', 'RGB', 'RGBA')
+
+
+def _target_size(size, max_side):
+    width, height = size
+    ratio = min(max_side / max(width, height), 1)
+    return max(round(width * ratio), 1), max(round(height * ratio), 1)
+
+
+def _open(upload):
+    """Открывает картинку, читая только заголовок."""
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            code='file_too_large',
+            params={'limit': settings.POST_IMAGE_MAX_UPLOAD_SIZE // 2 ** 20},
+        )
+    upload.seek(0)
+    try:
+        return Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Загрузите правильное изображение.', code='invalid_image')
+
+
+def process_image(upload):
+    """Проверяет, уменьшает и очищает загруженную картинку.
+
+    Возвращает новый файл для поля image и его размеры (ширина, высота).
+    """
+    image = _open(upload)
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    if image.format == 'GIF' and max(image.size) <= max_side:
+        # В GIF нет EXIF, а пересохранение потеряет анимацию.
+        upload.seek(0)
+        return upload, image.size
+    image.draft('RGB', _target_size(image.size, max_side))
+    if image.width * image.height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком большое изображение: %(width)d×%(height)d.',
+            code='too_many_pixels',
+            params={'width': image.width, 'height': image.height},
+        )
+    image_format = image.format
+    try:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    except OSError:
+        raise ValidationError(
+            'Загрузите правильное изображение.', code='invalid_image')
+    image.info = {key: value for key, value in image.info.items()
+                  if key in KEEP_INFO}
+    name, content_type = upload.name, upload.content_type
+    if image_format not in Image.SAVE:
+        image_format = FALLBACK_FORMAT
+        name = os.path.splitext(name)[0] + '.png'
+        content_type = 'image/png'
+        if image.mode not in FALLBACK_MODES:
+            image = image.convert(
+                'RGBA' if 'A' in image.getbands() else 'RGB')
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    try:
+        image.save(buffer, image_format, quality=QUALITY)
+    except (KeyError, OSError, ValueError):
+        raise ValidationError(
+            'Загрузите правильное изображение.', code='invalid_image')
+    processed = SimpleUploadedFile(name, buffer.getvalue(), content_type)
+    return processed, image.size
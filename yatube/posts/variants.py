@@ -0,0 +1,129 @@
+"""Варианты картинок постов для <picture> и srcset.
+
+Пресет из settings.POST_IMAGE_PRESETS задаёт пропорции, набор ширин
+и форматы по убыванию предпочтения. Варианты строит фоновый поток
+из posts/thumbnails.py один раз после загрузки картинки и записывает
+в ImageVariant, поэтому при рендеринге файловая система не трогается:
+размеры и адреса берутся из строк, выбранных вместе с постами.
+AVIF доступен, если установлен плагин pillow-avif-plugin.
+"""
+import os
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .models import VARIANT_DIRECTORY, ImageVariant, Post
+from .storage import is_hashed
+
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+EXTENSIONS = {'jpeg': 'jpg'}
+
+
+def supported_formats(formats):
+    """Форматы, которые установленный Pillow умеет сохранять."""
+    Image.init()
+    return [fmt for fmt in formats if fmt.upper() in Image.SAVE]
+
+
+def _widths(preset, source_width):
+    # Не растягиваем картинку: ширины больше оригинала не нужны,
+    # но самую маленькую строим всегда.
+    widths = sorted(preset['widths'])
+    return [width for width in widths
+            if width <= source_width] or widths[:1]
+
+
+def _encode(image, fmt, quality):
+    buffer = BytesIO()
+    image.save(buffer, fmt.upper(), quality=quality)
+    return ContentFile(buffer.getvalue())
+
+
+def _resizer(original):
+    """Уменьшение с кэшем: оригинал декодируется только при первом вызове."""
+    source = []
+
+    @lru_cache(maxsize=None)
+    def resize(size):
+        if not source:
+            source.append(ImageOps.exif_transpose(original).convert('RGB'))
+        return ImageOps.fit(source[0], size, Image.LANCZOS)
+    return resize
+
+
+def generate(post_id, name):
+    """Строит и записывает варианты всех пресетов для картинки поста.
+
+    У картинки с именем по содержимому (posts/storage.py) уже
+    существующие файлы вариантов переиспользуются без декодирования.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    reuse = is_hashed(name)
+    variants = []
+    storage = Post._meta.get_field('image').storage
+    with storage.open(name) as file, Image.open(file) as original:
+        resize = _resizer(original)
+        for preset_name, preset in settings.POST_IMAGE_PRESETS.items():
+            ratio_width, ratio_height = preset['ratio']
+            for width in _widths(preset, original.width):
+                height = round(width * ratio_height / ratio_width)
+                for fmt in supported_formats(preset['formats']):
+                    path = (f'{VARIANT_DIRECTORY}{stem}-{preset_name}-'
+                            f'{width}.{EXTENSIONS.get(fmt, fmt)}')
+                    if not (reuse and default_storage.exists(path)):
+                        path = default_storage.save(path, _encode(
+                            resize((width, height)), fmt,
+                            preset.get('quality', 80)))
+                    variants.append(ImageVariant(
+                        post_id=post_id, preset=preset_name, format=fmt,
+                        width=width, height=height, file=path))
+    with transaction.atomic():
+        ImageVariant.objects.filter(post_id=post_id).delete()
+        ImageVariant.objects.bulk_create(variants)
+    return variants
+
+
+def picture(variants, preset_name):
+    """Контекст для <picture> из вариантов одного поста.
+
+    Возвращает None, если варианты пресета ещё не построены.
+    """
+    preset = settings.POST_IMAGE_PRESETS[preset_name]
+    by_format = {}
+    for variant in variants:
+        if variant.preset == preset_name:
+            by_format.setdefault(variant.format, []).append(variant)
+    if not by_format:
+        return None
+    formats = [fmt for fmt in preset['formats'] if fmt in by_format]
+    # <img> получает последний формат списка - самый совместимый.
+    fallback = by_format[formats[-1]]
+    largest = max(fallback, key=lambda variant: variant.width)
+    return {
+        'sources': [
+            {'type': f'image/{fmt}', 'srcset': _srcset(by_format[fmt])}
+            for fmt in formats[:-1]
+        ],
+        'img': {
+            'url': largest.file.url,
+            'srcset': _srcset(fallback),
+            'width': largest.width,
+            'height': largest.height,
+        },
+        'sizes': preset['sizes'],
+    }
+
+
+def _srcset(variants):
+    return ', '.join(
+        f'{variant.file.url} {variant.width}w'
+        for variant in sorted(variants, key=lambda variant: variant.width))
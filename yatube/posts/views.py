@@ -1,35 +1,106 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
 from django.contrib.auth import get_user_model
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.db.models import F
+from django.http import (Http404, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
 
-from .models import Post, Group, Follow
+from . import export, newest, search, stats, thumbnails, timeline
+from .page_cache import (anonymous_page_cache, group_scope, index_scope,
+                         post_scope, profile_scope, tag_scope)
+from .models import Comment, Post, Group, Follow, Tag
 from .forms import PostForm, CommentForm
+from .paginators import (CursorPage, CursorPaginator, decode_cursor,
+                         encode_cursor)
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+NEW_POSTS_LIMIT = 50
+SEARCH_QUERY_LENGTH = 200
 User = get_user_model()
 
 
-def paginator(request, posts):
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def paginator(request, posts, key='pk', count=None):
+    """Разбивает ленту на страницы.
+
+    Курсорный режим (?after=<token> / ?before=<token>) включается
+    настройкой POSTS_PAGINATION = 'cursor' или самим токеном в запросе,
+    иначе используются обычные нумерованные страницы.
+    Известное заранее число записей (count) избавляет от COUNT(*).
+    Миниатюры картинок страницы ищутся разом через page_obj.thumbnails.
+    """
+    cursor_requested = 'after' in request.GET or 'before' in request.GET
+    if settings.POSTS_PAGINATION == 'cursor' or cursor_requested:
+        page_obj = CursorPaginator(posts, POSTS_PER_PAGE, key=key).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    else:
+        paginator = Paginator(posts, POSTS_PER_PAGE)
+        if count is not None:
+            paginator.count = count
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+    page_obj.thumbnails = thumbnails.PageThumbnails(page_obj)
     return page_obj
 
 
+def live_cursor(page_obj, name=None):
+    """Курсор первого поста, с которого страница ждёт новые посты.
+
+    None не на первой странице: там новых постов не показываем.
+    С именем ленты курсор берётся из её отметки (posts/newest.py),
+    и страница не загружается: её посты могут быть в кэше фрагмента.
+    Без отметки курсором служит первый пост страницы.
+    """
+    if page_obj.has_previous():
+        return None
+    mark = newest.get(name) if name else None
+    if mark is None:
+        if not len(page_obj):
+            return ''
+        if name:
+            newest.seed(name, newest.key_of(page_obj[0]))
+        return encode_cursor(page_obj[0])
+    timestamp, pk = mark
+    return encode_cursor(Post(
+        pk=pk, pub_date=datetime.fromtimestamp(timestamp, timezone.utc)))
+
+
+def comments_page(post_id, after=None):
+    """Порция комментариев поста, от новых к старым, вместе с авторами."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').only('text', 'created', 'author__username')
+    return CursorPaginator(
+        comments, COMMENTS_PER_PAGE, date_field='created').get_page(
+            after=after)
+
+
+@anonymous_page_cache(index_scope)
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.for_feed()
     page_obj = paginator(request, post_list)
     template = 'posts/index.html'
     context = {
         'page_obj': page_obj,
+        'live_cursor': live_cursor(page_obj, 'index'),
     }
     return render(request, template, context)
 
 
+@anonymous_page_cache(group_scope)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.for_feed()
     page_obj = paginator(request, post_list)
     template = 'posts/group_list.html'
     context = {
@@ -39,37 +110,81 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@anonymous_page_cache(tag_scope)
+def tag_posts(request, name):
+    """Посты с тегом: страница строк PostTag, затем сами посты."""
+    tag = get_object_or_404(Tag, name=name.lower())
+    page_obj = paginator(request, tag.entries.all(), key='post_id')
+    posts = Post.objects.for_feed().order_by().in_bulk(
+        [entry.post_id for entry in page_obj])
+    page_obj.object_list = [
+        posts[entry.post_id] for entry in page_obj if entry.post_id in posts
+    ]
+    return render(request, 'posts/tag_list.html', {
+        'tag': tag,
+        'page_obj': page_obj,
+    })
+
+
+@anonymous_page_cache(profile_scope)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_obj = paginator(request, post_list)
+    author_stats = stats.get_stats(author.pk)
+    post_list = author.posts.for_feed()
+    page_obj = paginator(request, post_list, count=author_stats.posts_count)
     following = (request.user.is_authenticated and author.following.filter(
         user=request.user).exists())
     template = 'posts/profile.html'
     context = {
         'author': author,
+        'author_stats': author_stats,
         'page_obj': page_obj,
         'following': following,
     }
     return render(request, template, context)
 
 
+def search_posts(request):
+    """Поиск по текстам постов, лучшие совпадения первыми."""
+    query = request.GET.get('q', '').strip()[:SEARCH_QUERY_LENGTH]
+    page_obj = search.search(query, request.GET.get('after'), POSTS_PER_PAGE)
+    page_obj.thumbnails = thumbnails.PageThumbnails(page_obj)
+    return render(request, 'posts/search.html', {
+        'search_query': query,
+        'page_obj': page_obj,
+    })
+
+
+@anonymous_page_cache(post_scope)
 def post_detail(request, post_id):
     """Отображает заметку с индексом <post_id>"""
 
     post = get_object_or_404(
-        Post,
+        Post.objects.select_related('author', 'group').prefetch_related(
+            'image_variants'),
         pk=post_id
     )
-    comments = post.comments.all()
+    comments = comments_page(post.pk)
     form = CommentForm()
     return render(request, 'posts/post_detail.html', {
         'post': post,
+        'author_stats': stats.get_stats(post.author_id),
         'form': form,
         'comments': comments,
     })
 
 
+@anonymous_page_cache(post_scope)
+def post_comments(request, post_id):
+    """HTML следующей порции комментариев для кнопки "Показать ещё"."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = comments_page(post.pk, request.GET.get('after'))
+    return render(request, 'includes/comment_list.html', {
+        'post': post,
+        'comments': comments,
+    })
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST, files=request.FILES or None)
@@ -115,11 +230,21 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     """Страница с постами авторов, на которых подписан текущий пользователь.
-    Информация о текущем пользователе доступна в переменной request.user.
-    Following - ссылка на объект пользователя, на которого подписываются.
+    Лента читается из заранее разложенных TimelineEntry (и постов
+    авторов выше порога): страница упорядоченных id постов,
+    затем сами посты одним запросом.
     """
-    followed_posts = Post.objects.filter(author__following__user=request.user)
-    context = {'page_obj': paginator(request, followed_posts)}
+    page_obj = paginator(
+        request, timeline.follow_feed(request.user.pk), key='post_id')
+    posts = Post.objects.for_feed().order_by().in_bulk(
+        [entry.post_id for entry in page_obj])
+    page_obj.object_list = [
+        posts[entry.post_id] for entry in page_obj if entry.post_id in posts
+    ]
+    context = {
+        'page_obj': page_obj,
+        'live_cursor': live_cursor(page_obj),
+    }
 
     return render(request, 'posts/follow.html', context)
 
@@ -141,3 +266,99 @@ def profile_unfollow(request, username):
                           author=author_to_unfollow).delete()
 
     return redirect('posts:profile', username=username)
+
+
+@staff_member_required
+def export_ndjson(request, name):
+    """Потоковая выгрузка для аналитики, см. posts/export.py."""
+    if name not in export.EXPORTS:
+        raise Http404('Нет такой выгрузки')
+    since = request.GET.get('since')
+    after_id = request.GET.get('after_id')
+    try:
+        since = export.parse_since(since) if since else None
+        after_id = int(after_id) if after_id else None
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        export.stream(name, since, after_id),
+        content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{name}.ndjson"'
+    return response
+
+
+def _live_feed(request, feed):
+    """Строки (pub_date, post_id) ленты и имена её отметок newest."""
+    if feed == 'index':
+        rows = Post.objects.annotate(post_id=F('pk')).values_list(
+            'pub_date', 'post_id', named=True)
+        return (lambda: rows), ('index',)
+    if feed != 'follow':
+        raise Http404('Нет такой ленты')
+    if not request.user.is_authenticated:
+        raise PermissionDenied
+    user_id = request.user.pk
+    pulled = newest.pulled(user_id, timeline.pulled_authors)
+    return (
+        lambda: timeline.follow_feed(user_id),
+        (f'follow:{user_id}', *(f'author:{pk}' for pk in pulled)),
+    )
+
+
+def _newer_rows(rows, since, limit):
+    """До limit строк ленты новее курсора, начиная с ближайших к нему."""
+    paginator = CursorPaginator(rows, limit, key='post_id')
+    if since is None:
+        return list(paginator.after_queryset()[:limit])[::-1]
+    return list(paginator.before_queryset(since)[:limit])
+
+
+def new_posts(request, feed):
+    """Сколько постов появилось в ленте после курсора since.
+
+    Пока отметка ленты в кэше не новее курсора, ответ строится без
+    запросов к базе, а повторный опрос получает 304 (posts/newest.py).
+    """
+    rows, names = _live_feed(request, feed)
+    since = decode_cursor(request.GET.get('since'))
+    mark = newest.get(*names)
+    if mark is None:
+        first = rows().order_by('-pub_date', '-post_id')[:1]
+        if first:
+            mark = (first[0].pub_date.timestamp(), first[0].post_id)
+        newest.seed(names[0], mark)
+    etag = '"{}"'.format(hashlib.md5(
+        f'{names}|{mark}|{request.GET.get("since")}'.encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        count = 0
+        if mark is not None and (
+                since is None or mark > (since[0].timestamp(), since[1])):
+            count = len(_newer_rows(rows(), since, NEW_POSTS_LIMIT + 1))
+        response = JsonResponse({
+            'count': min(count, NEW_POSTS_LIMIT),
+            'more': count > NEW_POSTS_LIMIT,
+            'interval': newest.POLL_INTERVAL,
+        })
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def new_post_cards(request, feed):
+    """Карточки постов новее курсора since, от новых к старым."""
+    rows, _ = _live_feed(request, feed)
+    since = decode_cursor(request.GET.get('since'))
+    found = _newer_rows(rows(), since, NEW_POSTS_LIMIT)[::-1]
+    posts = Post.objects.for_feed().order_by().in_bulk(
+        [row.post_id for row in found])
+    page_obj = CursorPage(
+        [posts[row.post_id] for row in found if row.post_id in posts], None)
+    page_obj.thumbnails = thumbnails.PageThumbnails(page_obj)
+    return render(request, 'includes/new_posts.html', {
+        'page_obj': page_obj,
+        'cursor': (encode_cursor(found[0], 'post_id') if found
+                   else request.GET.get('since', '')),
+        'show_details': feed == 'index',
+    })
@@ -128,13 +128,69 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Общий для всех воркеров кэш в файле SQLite, см. core/sqlite_cache.py
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'MAX_SIZE': 64 * 1024 * 1024,
+        },
     }
 }
 
+# Тесты работают с кэшем во временном каталоге, см. core/test_runner.py
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Загрузка картинок постов (posts/uploads.py): предел размера файла,
+# предел пикселей после уменьшения при декодировании и наибольшая
+# сторона сохраняемой картинки
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 24_000_000
+POST_IMAGE_MAX_SIDE = 2560
+
+# Миниатюры постов: пресет -> (геометрия, опции sorl-thumbnail).
+# Строятся в фоне после загрузки картинки, см. posts/thumbnails.py
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# 0 - строить сразу после коммита, без фонового потока
+THUMBNAIL_WORKERS = 2
+
+# Варианты картинок для <picture>/srcset: ширины, пропорции и форматы
+# по убыванию предпочтения (недоступные в Pillow пропускаются)
+POST_IMAGE_PRESETS = {
+    'card': {
+        'widths': (480, 960),
+        'ratio': (960, 339),
+        'formats': ('avif', 'webp', 'jpeg'),
+        'quality': 80,
+        'sizes': '(min-width: 768px) 720px, 100vw',
+    },
+}
+
+# 'page' - нумерованные страницы, 'cursor' - пагинация по (pub_date, id)
+POSTS_PAGINATION = 'page'
+
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются в follow_index при чтении
+TIMELINE_PUSH_THRESHOLD = 1000
+# Сколько последних постов раскладывать, когда автор опустился до порога,
+# и в скольких фоновых потоках (0 - сразу после коммита, без потока)
+TIMELINE_BACKFILL_POSTS = 200
+TIMELINE_WORKERS = 1
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Кто отдаёт MEDIA_URL (core/media.py): 'django' - FileResponse с Range
+# и условными GET, 'accel' - nginx по X-Accel-Redirect на
+# MEDIA_ACCEL_PREFIX, 'sendfile' - сервер по X-Sendfile
+MEDIA_DELIVERY = 'django'
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Где collect_media_garbage помнит, докуда дошёл обход MEDIA_ROOT
+MEDIA_GC_CHECKPOINT = os.path.join(BASE_DIR, 'media_gc.json')
@@ -3,13 +3,15 @@ from django.contrib import admin
 from django.urls import include, path
 
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core import media
 
 urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('admin/', admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('posts.api_urls', namespace='api')),
     path('', include('posts.urls', namespace='posts'))
 ]
 
@@ -17,7 +19,9 @@ handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 handler403 = 'core.views.permission_denied'
 
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
+# Медиа отдаются всегда: в DEBUG целиком, за nginx - через
+# X-Accel-Redirect (core/media.py).
+urlpatterns += [
+    path(f'{settings.MEDIA_URL.lstrip("/")}<path:path>', media.serve,
+         name='media'),
+]